@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+ENGAGEMENT_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+# Same weighting as rank_top_posts()
+SCORE_WEIGHTS = {"predicted_likesCount": 0.5, "predicted_commentsCount": 0.3, "predicted_reach": 0.2}
+
+
+def _compact(frame):
+    """Only the columns the comparison needs, with numeric types fixed"""
+    n = len(frame)
+    compact = pd.DataFrame({
+        "_id": frame["_id"].astype(str).to_numpy() if "_id" in frame else np.arange(n).astype(str),
+        "type": frame["type"].fillna("Unknown").astype(str).to_numpy() if "type" in frame else np.full(n, "Unknown"),
+        "caption": frame["caption"].to_numpy() if "caption" in frame else np.full(n, None),
+        "timestamp": frame["timestamp"].to_numpy() if "timestamp" in frame else np.full(n, None),
+    })
+    for col in ["likesCount", "commentsCount", *SCORE_WEIGHTS]:
+        values = pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype="float64") if col in frame else np.zeros(n)
+        compact[col] = np.nan_to_num(values)
+    return compact
+
+
+def compare_accounts(frames, k=3):
+    """
+    Side-by-side metrics for several collections, computed on one concatenated frame.
+
+    Args:
+        frames: dict of collection name -> posts DataFrame with predicted_<target> columns
+            (as returned by load_performance_predictions)
+        k: Top posts per account
+
+    Returns:
+        dict of DataFrames, one row (or k rows for top_posts) per account:
+        'engagement', 'type_mix', 'peak_hours', 'top_posts'
+    """
+    accounts = list(frames)
+    posts = pd.concat([_compact(frames[name]) for name in accounts], keys=accounts, names=["account", None])
+    posts = posts.reset_index(level=0).reset_index(drop=True)
+    posts["account"] = pd.Categorical(posts["account"], categories=accounts)
+    posts["engagement"] = posts["likesCount"] + posts["commentsCount"]
+    timestamps = pd.to_datetime(posts["timestamp"], utc=True, errors="coerce")
+    posts["hour"] = timestamps.dt.hour
+
+    by_account = posts.groupby("account", observed=False)
+
+    # Engagement distribution
+    engagement = by_account["engagement"].agg(["count", "mean", "std", "max"])
+    quantiles = by_account["engagement"].quantile(ENGAGEMENT_QUANTILES).unstack()
+    quantiles.columns = [f"p{int(q * 100)}" for q in quantiles.columns]
+    engagement = engagement.join(quantiles)
+    engagement["avg_likes"] = by_account["likesCount"].mean()
+    engagement["avg_comments"] = by_account["commentsCount"].mean()
+    engagement = engagement.rename(columns={"count": "posts", "mean": "avg_engagement", "std": "std_engagement",
+                                            "max": "max_engagement"})
+
+    # Share of posts and average engagement per post type
+    type_counts = pd.crosstab(posts["account"], posts["type"])
+    type_mix = type_counts.div(type_counts.sum(axis=1).replace(0, 1), axis=0)
+    type_mix.columns = [f"share_{col}" for col in type_mix.columns]
+    type_engagement = posts.pivot_table(index="account", columns="type", values="engagement", aggfunc="mean",
+                                        observed=False)
+    type_engagement.columns = [f"avg_engagement_{col}" for col in type_engagement.columns]
+    type_mix = type_mix.join(type_engagement).reindex(accounts)
+
+    # Peak hours: hour with the best mean engagement and the busiest posting hour
+    hourly = posts.dropna(subset=["hour"]).groupby(["account", "hour"], observed=False)["engagement"].agg(["mean", "size"])
+    hourly_mean = hourly["mean"].unstack().reindex(index=accounts)
+    hourly_size = hourly["size"].unstack().reindex(index=accounts)
+    peak_hours = pd.DataFrame(index=accounts)
+    has_hours = hourly_mean.notna().any(axis=1) if not hourly_mean.empty else pd.Series(False, index=accounts)
+    peak_hours["best_engagement_hour"] = hourly_mean[has_hours].idxmax(axis=1) if has_hours.any() else np.nan
+    peak_hours["best_hour_avg_engagement"] = hourly_mean.max(axis=1) if not hourly_mean.empty else np.nan
+    peak_hours["most_active_hour"] = hourly_size[has_hours].idxmax(axis=1) if has_hours.any() else np.nan
+
+    # Top posts, scored against each account's own maximum
+    score = np.zeros(len(posts))
+    for col, weight in SCORE_WEIGHTS.items():
+        score += weight * posts[col] / np.maximum(by_account[col].transform("max"), 1)
+    posts["performance_score"] = score
+    top_posts = (posts.sort_values(["account", "performance_score"], ascending=[True, False])
+                 .groupby("account", observed=False).head(k))
+    top_posts = top_posts[["account", "_id", "type", "performance_score", "timestamp", "caption",
+                           "likesCount", "commentsCount"]].rename(columns={"performance_score": "engagement_score"})
+
+    def with_account(frame):
+        frame = frame.copy()
+        frame.insert(0, "account", frame.index.astype(str))
+        return frame.reset_index(drop=True)
+
+    top_posts["account"] = top_posts["account"].astype(str)
+    return {
+        "engagement": with_account(engagement),
+        "type_mix": with_account(type_mix),
+        "peak_hours": with_account(peak_hours),
+        "top_posts": top_posts.reset_index(drop=True),
+    }
@@ -0,0 +1,92 @@
+"""
+Benchmark response serialization cost per 1k rows.
+
+Compares the previous path (per-column round/fillna, astype(str) on timestamps,
+to_dict(orient="records"), recursive NumPy conversion, jsonable_encoder and
+json.dumps) with frame_to_payload() + FastJSONResponse rendering.
+
+Usage:
+    python bench_serialization.py [--rows 1000 10000 100000] [--repeat 5]
+"""
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from response_encoding import dumps, frame_to_payload
+
+
+def make_frame(rows, seed=42):
+    """Build a synthetic frame shaped like the /top5_posts output"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "_id": [f"post_{i}" for i in range(rows)],
+        "type": rng.choice(["Image", "Video", "Sidecar"], size=rows),
+        "engagement_score": rng.random(rows),
+        "timestamp": pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, size=rows), unit="s"),
+        "caption": [f"caption text number {i} #insta #trend" for i in range(rows)],
+        "likesCount": rng.integers(0, 100000, size=rows),
+        "commentsCount": rng.integers(0, 5000, size=rows),
+    })
+
+
+def _convert_numpy_types(obj):
+    # Previous recursive walker, kept here only for comparison
+    if isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, dict):
+        return {k: _convert_numpy_types(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_convert_numpy_types(i) for i in obj]
+    else:
+        return obj
+
+
+def legacy_serialize(df):
+    df = df.copy()
+    df["timestamp"] = df["timestamp"].astype(str)
+    for col in df.columns:
+        if col not in ["_id", "caption", "timestamp", "type", "media_url"]:
+            if pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = df[col].round(2).fillna(0)
+    result = _convert_numpy_types(df.to_dict(orient="records"))
+    content = jsonable_encoder({"status": "success", "top_posts": result})
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_serialize(df, orient="records"):
+    return dumps({"status": "success", "top_posts": frame_to_payload(df, orient=orient)})
+
+
+def time_it(fn, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} | {'legacy ms/1k':>12} | {'records ms/1k':>13} | {'columns ms/1k':>13} | {'speedup':>7}")
+    for rows in args.rows:
+        df = make_frame(rows)
+        legacy = time_it(legacy_serialize, df, args.repeat)
+        records = time_it(fast_serialize, df, args.repeat)
+        columns = time_it(lambda d: fast_serialize(d, orient="columns"), df, args.repeat)
+        per_1k = 1000 / rows * 1000
+        print(f"{rows:>8} | {legacy * per_1k:>12.2f} | {records * per_1k:>13.2f} | {columns * per_1k:>13.2f} | {legacy / records:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.decomposition import TruncatedSVD
+
+# Dense embedding size after LSA; smaller collections use fewer dimensions
+CAPTION_EMBEDDING_DIM = int(os.getenv("CAPTION_EMBEDDING_DIM", 128))
+CAPTION_INDEX_TTL = int(os.getenv("CAPTION_INDEX_TTL", 1800))  # seconds
+CAPTION_INDEX_SIZE = int(os.getenv("CAPTION_INDEX_SIZE", 16))  # collections kept in memory
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()  # Indexes are built in worker threads
+
+
+class CaptionIndex:
+    """
+    In-memory caption vector index for one collection.
+
+    Captions are embedded once with TF-IDF over words, bigrams and hashtags,
+    reduced with truncated SVD (LSA) when the collection is large enough, and
+    stored as a dense, L2-normalized float32 matrix so cosine similarity is a
+    single matrix product.
+    """
+
+    def __init__(self, data):
+        captions = data["caption"].fillna("").astype(str).tolist() if "caption" in data else [""] * len(data)
+        self.posts = pd.DataFrame({
+            "_id": data["_id"].astype(str).to_numpy() if "_id" in data else np.arange(len(data)).astype(str),
+            "type": data["type"].to_numpy() if "type" in data else None,
+            "caption": captions,
+            "likesCount": _numeric_column(data, "likesCount"),
+            "commentsCount": _numeric_column(data, "commentsCount"),
+        })
+        self.posts["engagement"] = self.posts["likesCount"].fillna(0) + self.posts["commentsCount"].fillna(0)
+        self._positions = {post_id: i for i, post_id in enumerate(self.posts["_id"].tolist())}
+        self.downsampled_from = data.attrs.get("downsampled_from")  # Set when built from a sample
+
+        self.vectorizer = TfidfVectorizer(
+            lowercase=True, sublinear_tf=True, ngram_range=(1, 2), min_df=1,
+            token_pattern=r"(?u)#?\b\w\w+\b", dtype=np.float32,
+        )
+        try:
+            tfidf = self.vectorizer.fit_transform(captions)
+        except ValueError:  # Every caption is empty
+            self.vectorizer = None
+            self.svd = None
+            self.vectors = np.zeros((len(captions), 1), dtype=np.float32)
+            return
+
+        n_components = min(CAPTION_EMBEDDING_DIM, tfidf.shape[0] - 1, tfidf.shape[1] - 1)
+        if n_components >= 2:
+            self.svd = TruncatedSVD(n_components=n_components, random_state=42)
+            vectors = self.svd.fit_transform(tfidf)
+        else:
+            self.svd = None
+            vectors = tfidf.toarray()
+        self.vectors = _normalize(vectors.astype(np.float32))
+
+    def __len__(self):
+        return len(self.posts)
+
+    def embed(self, texts):
+        """Embed query texts into the index space"""
+        if self.vectorizer is None:
+            return np.zeros((len(texts), self.vectors.shape[1]), dtype=np.float32)
+        tfidf = self.vectorizer.transform(texts)
+        vectors = self.svd.transform(tfidf) if self.svd is not None else tfidf.toarray()
+        return _normalize(vectors.astype(np.float32))
+
+    def top_k(self, query_vectors, k=10, exclude=None):
+        """
+        Batched cosine top-K.
+
+        Args:
+            query_vectors: (m, d) normalized query matrix
+            k: Results per query
+            exclude: Optional list of one index position per query to leave out
+                (the query post itself)
+
+        Returns:
+            (indices, scores), both (m, k'), best first
+        """
+        scores = query_vectors @ self.vectors.T
+        if exclude is not None:
+            scores[np.arange(len(exclude)), exclude] = -np.inf
+        k = min(k, scores.shape[1] - (1 if exclude is not None else 0))
+        if k <= 0:
+            return np.empty((len(scores), 0), dtype=np.int64), np.empty((len(scores), 0))
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+    def search(self, queries, k=10):
+        """Posts most similar to each query text"""
+        indices, scores = self.top_k(self.embed(queries), k)
+        return [self._results(i, s) for i, s in zip(indices, scores)]
+
+    def similar_to(self, post_ids, k=10):
+        """Posts most similar to each given post, excluding the post itself"""
+        positions = [self._positions.get(str(post_id)) for post_id in post_ids]
+        missing = [post_id for post_id, pos in zip(post_ids, positions) if pos is None]
+        if missing:
+            raise KeyError(f"Posts not found in collection: {missing}")
+        indices, scores = self.top_k(self.vectors[positions], k, exclude=positions)
+        return [self._results(i, s) for i, s in zip(indices, scores)]
+
+    def best_post_id(self):
+        """Id of the post with the highest actual engagement"""
+        return self.posts["_id"].iloc[int(self.posts["engagement"].to_numpy().argmax())]
+
+    def _results(self, indices, scores):
+        results = self.posts.iloc[indices].copy()
+        results["similarity"] = scores
+        return results
+
+
+def _numeric_column(data, column):
+    if column not in data:
+        return np.zeros(len(data))
+    return pd.to_numeric(data[column], errors="coerce").to_numpy(dtype="float64")
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def get_index(collection_id):
+    """Cached index for a collection, or None if missing/expired"""
+    with _index_cache_lock:
+        entry = _index_cache.get(collection_id)
+        if entry is None:
+            return None
+        created, index = entry
+        if time.monotonic() - created > CAPTION_INDEX_TTL:
+            _index_cache.pop(collection_id, None)
+            return None
+        _index_cache.move_to_end(collection_id)
+        return index
+
+
+def build_index(collection_id, data, cache=True):
+    """Embed a collection's captions and cache the index (unless cache is False)"""
+    start = time.perf_counter()
+    index = CaptionIndex(data)
+    if cache:
+        with _index_cache_lock:
+            _index_cache[collection_id] = (time.monotonic(), index)
+            _index_cache.move_to_end(collection_id)
+            while len(_index_cache) > CAPTION_INDEX_SIZE:
+                _index_cache.popitem(last=False)
+    print(f"🔎 Indexed {len(index)} captions ({index.vectors.shape[1]} dims) in {time.perf_counter() - start:.2f}s")
+    return index
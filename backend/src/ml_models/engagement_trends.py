@@ -0,0 +1,179 @@
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Supported bucket sizes -> pandas period codes
+FREQUENCIES = {"day": "D", "week": "W", "month": "M"}
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thur", "Fri", "Sat", "Sun"]
+
+# Bucketed series are cached per (collection, frequency)
+TREND_CACHE_TTL = int(os.getenv("TREND_CACHE_TTL", 300))  # seconds
+TREND_CACHE_SIZE = int(os.getenv("TREND_CACHE_SIZE", 64))  # entries
+
+_trend_cache = OrderedDict()
+
+
+def get_cached_buckets(collection_id, frequency):
+    """Return cached buckets for a collection, or None if missing/expired"""
+    key = (collection_id, frequency)
+    entry = _trend_cache.get(key)
+    if entry is None:
+        return None
+    created, buckets = entry
+    if time.monotonic() - created > TREND_CACHE_TTL:
+        _trend_cache.pop(key, None)
+        return None
+    _trend_cache.move_to_end(key)
+    return buckets
+
+
+def cache_buckets(collection_id, frequency, buckets):
+    """Store buckets for a collection, evicting the least recently used entry"""
+    _trend_cache[(collection_id, frequency)] = (time.monotonic(), buckets)
+    _trend_cache.move_to_end((collection_id, frequency))
+    while len(_trend_cache) > TREND_CACHE_SIZE:
+        _trend_cache.popitem(last=False)
+
+
+def invalidate_trends(collection_id=None):
+    """Drop cached buckets for one collection, or all of them"""
+    for key in [k for k in _trend_cache if collection_id is None or k[0] == collection_id]:
+        _trend_cache.pop(key, None)
+
+
+def _engagement_frame(data):
+    """Extract the compact per-post columns the trend engine works on"""
+    n = len(data)
+    likes = pd.to_numeric(data["likesCount"], errors="coerce") if "likesCount" in data else pd.Series(np.zeros(n), index=data.index)
+    comments = pd.to_numeric(data["commentsCount"], errors="coerce") if "commentsCount" in data else pd.Series(np.zeros(n), index=data.index)
+    posts = pd.DataFrame({
+        "timestamp": pd.to_datetime(data["timestamp"], utc=True, errors="coerce"),
+        "type": data["type"].fillna("Unknown").astype(str) if "type" in data else "Unknown",
+        "likes": likes.fillna(0).to_numpy(dtype="float64"),
+        "comments": comments.fillna(0).to_numpy(dtype="float64"),
+    })
+    posts = posts.dropna(subset=["timestamp"])
+    posts["engagement"] = posts["likes"] + posts["comments"]
+    return posts
+
+
+def compute_trend_buckets(data, frequency="day"):
+    """
+    Bucket a collection's engagement into day/week/month periods.
+
+    Args:
+        data: DataFrame of posts with 'timestamp', 'likesCount', 'commentsCount'
+            and optionally 'type'
+        frequency: One of "day", "week" or "month"
+
+    Returns:
+        dict with 'series' (one row per bucket, empty buckets included),
+        'by_type' (engagement per bucket and post type), 'by_day' and 'by_hour'
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency: {frequency}. Use one of {list(FREQUENCIES)}")
+    if "timestamp" not in data.columns:
+        raise Exception("Missing required columns: ['timestamp']")
+
+    posts = _engagement_frame(data)
+    if posts.empty:
+        raise Exception("No posts with a valid timestamp")
+
+    naive = posts["timestamp"].dt.tz_localize(None)
+    periods = naive.dt.to_period(FREQUENCIES[frequency])
+    full_range = pd.period_range(periods.min(), periods.max(), freq=FREQUENCIES[frequency])
+
+    series = posts.groupby(periods.to_numpy()).agg(
+        posts=("engagement", "size"),
+        likes=("likes", "sum"),
+        comments=("comments", "sum"),
+        engagement=("engagement", "sum"),
+    ).reindex(full_range, fill_value=0)
+
+    by_type = posts.groupby([periods.to_numpy(), posts["type"].to_numpy()])["engagement"].sum()
+    by_type = by_type.unstack(fill_value=0).reindex(full_range, fill_value=0)
+
+    by_day = posts.groupby(naive.dt.dayofweek.to_numpy()).agg(
+        posts=("engagement", "size"), likes=("likes", "sum"), comments=("comments", "sum")
+    ).reindex(range(7), fill_value=0)
+    by_day.insert(0, "day", DAY_NAMES)
+
+    by_hour = posts.groupby(naive.dt.hour.to_numpy()).agg(
+        posts=("engagement", "size"), likes=("likes", "sum"), comments=("comments", "sum")
+    ).reindex(range(24), fill_value=0)
+    by_hour.insert(0, "hour", np.arange(24))
+
+    for frame in (by_day, by_hour):
+        frame["total"] = frame["likes"] + frame["comments"]
+        frame["ratio"] = frame["likes"] / np.maximum(frame["comments"], 1)
+
+    by_type_totals = posts.groupby("type").agg(
+        count=("engagement", "size"), likes=("likes", "sum"), comments=("comments", "sum")
+    ).reset_index().rename(columns={"type": "postType"})
+
+    return {
+        "frequency": frequency,
+        "series": series,
+        "by_type": by_type,
+        "by_type_totals": by_type_totals,
+        "by_day": by_day.reset_index(drop=True),
+        "by_hour": by_hour.reset_index(drop=True),
+    }
+
+
+def _downsample(frame, max_points, sum_columns):
+    """Merge consecutive buckets so the frame has at most max_points rows"""
+    if not max_points or len(frame) <= max_points:
+        return frame
+    chunk = int(np.ceil(len(frame) / max_points))
+    groups = np.arange(len(frame)) // chunk
+    agg = {col: ("sum" if col in sum_columns else "mean") for col in frame.columns if col != "date"}
+    agg["date"] = "first"
+    return frame.groupby(groups).agg(agg)[frame.columns]
+
+
+def build_trend_report(buckets, window=7, max_points=None):
+    """
+    Derive rolling means and growth rates from bucketed series.
+
+    Args:
+        buckets: Output of compute_trend_buckets()
+        window: Rolling window size, in buckets
+        max_points: Optional cap on returned points per series, for plotting
+
+    Returns:
+        dict of DataFrames: 'series', 'by_type', 'by_type_totals', 'by_day', 'by_hour'
+    """
+    window = max(int(window or 1), 1)
+    series = buckets["series"]
+
+    trend = pd.DataFrame({"date": series.index.start_time})
+    for col in ["posts", "likes", "comments", "engagement"]:
+        trend[col] = series[col].to_numpy()
+
+    # Engagement rate: average engagement per post in the bucket
+    trend["engagement_rate"] = trend["engagement"] / np.maximum(trend["posts"], 1)
+    trend["rolling_engagement"] = trend["engagement"].rolling(window, min_periods=1).mean()
+    trend["rolling_engagement_rate"] = trend["engagement_rate"].rolling(window, min_periods=1).mean()
+    trend = _downsample(trend, max_points, sum_columns={"posts", "likes", "comments", "engagement"})
+
+    # Recompute ratios on the (possibly merged) buckets rather than averaging them
+    trend["engagement_rate"] = trend["engagement"] / np.maximum(trend["posts"], 1)
+    trend["growth_rate"] = trend["engagement"].pct_change().replace([np.inf, -np.inf], np.nan)
+
+    by_type = buckets["by_type"].copy()
+    by_type.columns = [str(col) for col in by_type.columns]
+    by_type.insert(0, "date", by_type.index.start_time)
+    by_type = by_type.reset_index(drop=True)
+    by_type = _downsample(by_type, max_points, sum_columns=set(by_type.columns))
+
+    return {
+        "series": trend,
+        "by_type": by_type,
+        "by_type_totals": buckets["by_type_totals"],
+        "by_day": buckets["by_day"],
+        "by_hour": buckets["by_hour"],
+    }
@@ -0,0 +1,149 @@
+"""
+In-process stand-in for the AstraDB Data API client, for offline performance testing.
+
+Implements the subset of astrapy's DataAPIClient used by model_endpoints.py
+(get_database, info, list_collections, get_collection, find) on top of
+synthetic collections. Cursors return documents in pages and sleep for a
+configurable latency per page, on the calling thread, the way the real
+synchronous client blocks while waiting on the network.
+
+Enable it for the API with FAKE_ASTRA_DB=1. Configuration:
+    FAKE_ASTRA_COLLECTIONS  name:rows pairs, e.g. "synthetic_1k:1000,synthetic_50k:50000"
+    FAKE_ASTRA_LATENCY      seconds per page (default 0.02)
+    FAKE_ASTRA_CONNECT_LATENCY  seconds per get_database call (default 0.05)
+    FAKE_ASTRA_PAGE_SIZE    documents per page (default 20, like the Data API)
+"""
+import os
+import time
+from types import SimpleNamespace
+import numpy as np
+
+POST_TYPES = ["Image", "Video", "Sidecar"]
+WORDS = ["sunset", "beach", "coffee", "gym", "workout", "travel", "food", "pizza", "dog", "cat",
+         "fashion", "style", "music", "weekend", "city", "nature", "friends", "love", "art", "summer"]
+HASHTAGS = ["fitness", "travel", "foodie", "ootd", "photography", "instagood", "reels", "nature", "art", "music"]
+
+DEFAULT_COLLECTIONS = "synthetic_1k:1000,synthetic_10k:10000"
+
+
+def synthetic_posts(rows, seed=0):
+    """Generate documents shaped like the filtered Apify items stored by the Node backend"""
+    rng = np.random.default_rng(seed)
+    types = rng.choice(POST_TYPES, size=rows, p=[0.5, 0.3, 0.2])
+    base = rng.lognormal(5, 1.2, size=rows)
+    boost = np.select([types == "Video", types == "Sidecar"], [1.6, 1.2], 1.0)
+    likes = (base * boost).astype(np.int64)
+    comments = (likes * rng.uniform(0.005, 0.05, size=rows)).astype(np.int64)
+    start = np.datetime64("2024-01-01T00:00:00")
+    timestamps = start + rng.integers(0, 365 * 24 * 3600, size=rows).astype("timedelta64[s]")
+    hashtag_counts = rng.integers(0, 8, size=rows)
+    mention_counts = rng.integers(0, 3, size=rows)
+    caption_lengths = rng.integers(0, 25, size=rows)
+
+    docs = []
+    for i in range(rows):
+        hashtags = rng.choice(HASHTAGS, size=hashtag_counts[i], replace=False).tolist()
+        caption = " ".join(rng.choice(WORDS, size=caption_lengths[i]).tolist() + [f"#{h}" for h in hashtags])
+        docs.append({
+            "_id": f"post_{seed}_{i}",
+            "type": str(types[i]),
+            "likesCount": int(likes[i]),
+            "commentsCount": int(comments[i]),
+            "hashtags": hashtags,
+            "mentions": [f"user{j}" for j in range(mention_counts[i])],
+            "caption": caption,
+            "timestamp": f"{timestamps[i]}.000Z",
+        })
+    return docs
+
+
+class FakeCursor:
+    """Iterator over documents that sleeps once per page, consumed once like astrapy's find cursor"""
+
+    def __init__(self, docs, page_size, latency):
+        self._docs = docs
+        self._page_size = page_size
+        self._latency = latency
+        self._position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._position >= len(self._docs):
+            raise StopIteration
+        if self._latency and self._position % self._page_size == 0:
+            time.sleep(self._latency)
+        doc = self._docs[self._position]
+        self._position += 1
+        return doc
+
+
+class FakeCollection:
+    def __init__(self, name, docs, page_size, latency):
+        self.name = name
+        self._docs = docs
+        self._page_size = page_size
+        self._latency = latency
+
+    def find(self, filter=None, **kwargs):
+        return FakeCursor(self._docs, self._page_size, self._latency)
+
+
+class FakeDatabase:
+    def __init__(self, store, page_size, latency):
+        self._store = store
+        self._page_size = page_size
+        self._latency = latency
+
+    def info(self):
+        return SimpleNamespace(name="fake_astra")
+
+    def list_collections(self):
+        return [SimpleNamespace(name=name) for name in self._store]
+
+    def get_collection(self, name):
+        if name not in self._store:
+            raise Exception(f"Collection not found: {name}")
+        return FakeCollection(name, self._store[name], self._page_size, self._latency)
+
+
+class FakeDataAPIClient:
+    """Drop-in replacement for astrapy.DataAPIClient backed by synthetic collections"""
+
+    # Shared by all client instances, so collections are generated once per process
+    store = {}
+    latency = float(os.getenv("FAKE_ASTRA_LATENCY", 0.02))
+    connect_latency = float(os.getenv("FAKE_ASTRA_CONNECT_LATENCY", 0.05))
+    page_size = int(os.getenv("FAKE_ASTRA_PAGE_SIZE", 20))
+
+    def __init__(self, token=None, **kwargs):
+        if not FakeDataAPIClient.store:
+            configure(os.getenv("FAKE_ASTRA_COLLECTIONS", DEFAULT_COLLECTIONS))
+
+    def get_database(self, api_endpoint=None, **kwargs):
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        return FakeDatabase(self.store, self.page_size, self.latency)
+
+
+def configure(collections=None, latency=None, connect_latency=None, page_size=None):
+    """
+    (Re)configure the fake backend.
+
+    Args:
+        collections: dict of name -> rows, or a "name:rows,..." string
+        latency: Seconds per page of results
+        connect_latency: Seconds per get_database call
+        page_size: Documents per page
+    """
+    if isinstance(collections, str):
+        collections = {name: int(rows) for name, rows in (item.split(":") for item in collections.split(",") if item)}
+    if collections is not None:
+        FakeDataAPIClient.store = {name: synthetic_posts(rows, seed=i) for i, (name, rows) in enumerate(collections.items())}
+    if latency is not None:
+        FakeDataAPIClient.latency = latency
+    if connect_latency is not None:
+        FakeDataAPIClient.connect_latency = connect_latency
+    if page_size is not None:
+        FakeDataAPIClient.page_size = page_size
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, writes are still atomic renames
+    fcntl = None
+
+# Shared by every worker process on the host
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", "./.feature_cache/")
+FEATURE_CACHE_MAX_BYTES = int(os.getenv("FEATURE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+FEATURE_CACHE_ENABLED = os.getenv("FEATURE_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+
+def model_version(*directories):
+    """Content hash of every model file in the given directories"""
+    digest = hashlib.sha256()
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path):
+                continue
+            digest.update(name.encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _entry_key(collection_id, kind, version):
+    return hashlib.sha256(f"{collection_id}\0{kind}\0{version}".encode()).hexdigest()[:32]
+
+
+@contextmanager
+def _locked(exclusive=True):
+    """Advisory lock on the cache directory, shared between worker processes"""
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(FEATURE_CACHE_DIR, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_text(values):
+    return np.asarray(values).dtype.kind not in "biufM"
+
+
+def _to_storable(values):
+    """Convert a numeric or datetime column to an array that np.load can memory-map (no pickles)"""
+    values = np.asarray(values)
+    if values.dtype.kind == "M":
+        return values.astype("datetime64[ns]")
+    return values
+
+
+def _encode_text(values):
+    """
+    Pack a text column into one UTF-8 byte buffer, end offsets and a missing-value mask.
+
+    Fixed-width unicode arrays would size every cell for the longest caption.
+    """
+    values = np.asarray(values, dtype=object)
+    missing = np.asarray(pd.isna(values), dtype=bool)
+    encoded = [b"" if m else str(v).encode("utf-8") for v, m in zip(values.tolist(), missing.tolist())]
+    offsets = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, missing
+
+
+def _decode_text(buffer, offsets, missing):
+    data = buffer.tobytes()
+    starts = np.concatenate([[0], offsets[:-1]]).tolist()
+    values = np.array([data[a:b].decode("utf-8") for a, b in zip(starts, offsets.tolist())], dtype=object)
+    values[missing] = None
+    return values
+
+
+def load(collection_id, kind, version):
+    """
+    Load cached arrays for a collection.
+
+    Args:
+        collection_id: Collection the arrays were computed from
+        kind: Name of the cached artifact, e.g. "performance"
+        version: Model version the arrays were computed with
+
+    Returns:
+        dict of name -> read-only memory-mapped array (text columns are decoded
+        into object arrays, with None for missing values), or None on a miss
+    """
+    if not FEATURE_CACHE_ENABLED:
+        return None
+    entry = os.path.join(FEATURE_CACHE_DIR, _entry_key(collection_id, kind, version))
+    try:
+        with _locked(exclusive=False):
+            with open(os.path.join(entry, "meta.json")) as f:
+                meta = json.load(f)
+            text_columns = set(meta.get("text_columns", []))
+            arrays = {}
+            for i, name in enumerate(meta["columns"]):
+                values = np.load(os.path.join(entry, f"{i}.npy"), mmap_mode="r")
+                if name in text_columns:
+                    values = _decode_text(values, np.load(os.path.join(entry, f"{i}.offsets.npy")),
+                                          np.load(os.path.join(entry, f"{i}.missing.npy")))
+                arrays[name] = values
+            os.utime(entry)  # Mark as recently used for eviction; under the lock so eviction can't race it
+        return arrays
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def store(collection_id, kind, version, arrays):
+    """
+    Write arrays for a collection to the shared cache, then evict old entries.
+
+    The entry is written to a temporary directory and renamed into place, so
+    other workers never see a partial entry.
+    """
+    if not FEATURE_CACHE_ENABLED:
+        return
+    key = _entry_key(collection_id, kind, version)
+    entry = os.path.join(FEATURE_CACHE_DIR, key)
+    try:
+        os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key}.", dir=FEATURE_CACHE_DIR)
+        columns = list(arrays)
+        text_columns = [name for name in columns if _is_text(arrays[name])]
+        for i, name in enumerate(columns):
+            if name in text_columns:
+                buffer, offsets, missing = _encode_text(arrays[name])
+                np.save(os.path.join(tmp, f"{i}.npy"), buffer, allow_pickle=False)
+                np.save(os.path.join(tmp, f"{i}.offsets.npy"), offsets, allow_pickle=False)
+                np.save(os.path.join(tmp, f"{i}.missing.npy"), missing, allow_pickle=False)
+            else:
+                np.save(os.path.join(tmp, f"{i}.npy"), _to_storable(arrays[name]), allow_pickle=False)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"collection": collection_id, "kind": kind, "version": version,
+                       "columns": columns, "text_columns": text_columns, "created": time.time()}, f)
+
+        with _locked(exclusive=True):
+            if os.path.isdir(entry):
+                shutil.rmtree(tmp, ignore_errors=True)  # Another worker got there first
+            else:
+                os.rename(tmp, entry)
+            _evict()
+    except Exception as e:
+        print(f"⚠️ Feature cache write failed for {collection_id}: {e}")
+
+
+def _entry_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def _evict():
+    """Delete least recently used entries until the cache fits in FEATURE_CACHE_MAX_BYTES"""
+    entries = []
+    for name in os.listdir(FEATURE_CACHE_DIR):
+        path = os.path.join(FEATURE_CACHE_DIR, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        entries.append((os.path.getmtime(path), _entry_size(path), path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= FEATURE_CACHE_MAX_BYTES:
+            break
+        # Open memory maps in other workers stay valid after unlink
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def stats():
+    """Number of entries and bytes used by the cache"""
+    if not os.path.isdir(FEATURE_CACHE_DIR):
+        return {"entries": 0, "bytes": 0, "max_bytes": FEATURE_CACHE_MAX_BYTES}
+    paths = [os.path.join(FEATURE_CACHE_DIR, name) for name in os.listdir(FEATURE_CACHE_DIR) if not name.startswith(".")]
+    paths = [p for p in paths if os.path.isdir(p)]
+    return {"entries": len(paths), "bytes": sum(_entry_size(p) for p in paths), "max_bytes": FEATURE_CACHE_MAX_BYTES}
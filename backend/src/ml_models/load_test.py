@@ -0,0 +1,210 @@
+"""
+Load generator for the Instagram analysis API.
+
+Drives the FastAPI app with concurrent mixed traffic against synthetic
+collections and reports throughput, tail latency per endpoint and
+event-loop blockage. By default the app runs in-process against the fake
+AstraDB backend (fake_astra.py), so no ASTRA_DB_TOKEN is needed; use --url
+to target a running server instead (event-loop lag is then not measured).
+
+Usage:
+    python load_test.py --collections synthetic_1k:1000,synthetic_20k:20000 \\
+        --concurrency 16 --duration 20 --latency 0.02 --stub-models
+    python load_test.py --url http://127.0.0.1:8000 --collections <existing collection> --duration 30
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+import numpy as np
+import httpx
+
+DEFAULT_MIX = ("recommend=3,top5_posts=3,top5_posts_streaming=1,posting_time=2,engagement_trends=2,"
+               "search_captions=1,what_if=1,health=1")
+
+
+def request_for(endpoint, collection, rng):
+    """(method, path, json body) for one request to the given endpoint"""
+    if endpoint == "health":
+        return "GET", "/health", None
+    if endpoint == "what_if":
+        return "POST", "/what_if", {"hour": rng.sample(range(24), 6), "top_n": 5}
+    body = {"collection_name": collection}
+    if endpoint == "top5_posts_streaming":
+        body.update(mode="streaming", page_size=500)
+        return "POST", "/top5_posts", body
+    if endpoint == "engagement_trends":
+        body.update(frequency=rng.choice(["day", "week", "month"]), max_points=200)
+    elif endpoint == "search_captions":
+        body.update(query=rng.choice(["beach sunset", "gym workout", "pizza food", "#travel"]), k=10)
+    return "POST", f"/{endpoint}", body
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from short sleeps"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(loop.time() - start - self.interval, 0))
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def report(self):
+        if not self.lags:
+            return "n/a"
+        lags = np.asarray(self.lags) * 1000
+        blocked = lags[lags > 50].sum() / 1000
+        return (f"p50={np.percentile(lags, 50):.1f}ms p99={np.percentile(lags, 99):.1f}ms "
+                f"max={lags.max():.1f}ms blocked>50ms={blocked:.2f}s")
+
+
+def install_stub_models(app_module):
+    """Deterministic stand-in estimators for whichever model files are missing"""
+
+    class StubEngagementModel:
+        def __init__(self, scale):
+            self.scale = scale
+
+        def predict(self, X):
+            X = np.asarray(X, dtype="float64")
+            return np.log1p(np.maximum(self.scale * (1 + 0.3 * X[:, 2] - 0.2 * np.abs(X[:, 1]) + 0.1 * X[:, 0]), 0))
+
+    class StubPerformanceModel:
+        def __init__(self, scale):
+            self.scale = scale
+
+        def predict(self, X):
+            return np.log1p(self.scale * np.sqrt(np.maximum(np.asarray(X, dtype="float64")[:, 0], 0)))
+
+    class IdentityScaler:
+        def transform(self, X):
+            return np.asarray(X, dtype="float64")
+
+    if not app_module.engagement_models:
+        app_module.engagement_models.update(likesCount=StubEngagementModel(200), commentsCount=StubEngagementModel(10))
+        try:
+            from joblib import load
+            app_module.engagement_scaler = load(f"{app_module.ENGAGEMENT_MODEL_DIR}features_scaler.pkl")
+        except Exception:
+            app_module.engagement_scaler = IdentityScaler()
+        print("Installed stub engagement models")
+    if not app_module.performance_models:
+        app_module.performance_models.update(likesCount=StubPerformanceModel(50), commentsCount=StubPerformanceModel(3))
+        print("Installed stub performance models")
+
+
+async def run_load(client, endpoints, weights, collections, concurrency, duration, total_requests, seed):
+    results = defaultdict(list)  # endpoint -> [(latency, status)]
+    deadline = time.perf_counter() + duration if duration else None
+    issued = 0
+
+    async def worker(worker_id):
+        nonlocal issued
+        rng = random.Random(seed + worker_id)
+        while True:
+            if deadline and time.perf_counter() >= deadline:
+                return
+            if total_requests and issued >= total_requests:
+                return
+            issued += 1
+            endpoint = rng.choices(endpoints, weights)[0]
+            method, path, body = request_for(endpoint, rng.choice(collections), rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            results[endpoint].append((time.perf_counter() - start, status))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return results, time.perf_counter() - start
+
+
+def print_report(results, elapsed, lag_report):
+    total = sum(len(v) for v in results.values())
+    print(f"\n{total} requests in {elapsed:.1f}s -> {total / elapsed:.1f} req/s")
+    print(f"{'endpoint':<22} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint, samples in sorted(results.items()):
+        latencies = np.asarray([lat for lat, _ in samples]) * 1000
+        errors = sum(1 for _, status in samples if status != 200)
+        print(f"{endpoint:<22} {len(samples):>6} {errors:>6} {np.percentile(latencies, 50):>8.1f} "
+              f"{np.percentile(latencies, 95):>8.1f} {np.percentile(latencies, 99):>8.1f} {latencies.max():>8.1f}")
+    statuses = defaultdict(int)
+    for samples in results.values():
+        for _, status in samples:
+            statuses[status] += 1
+    print(f"statuses: {dict(statuses)}")
+    print(f"event loop lag: {lag_report}")
+
+
+async def main(args):
+    mix = dict(item.split("=") for item in args.mix.split(","))
+    endpoints, weights = list(mix), [float(w) for w in mix.values()]
+    collections = [item.split(":")[0] for item in args.collections.split(",")]
+
+    monitor = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        os.environ["FAKE_ASTRA_DB"] = "1"
+        os.environ["FAKE_ASTRA_COLLECTIONS"] = args.collections
+        os.environ.setdefault("FEATURE_CACHE_DIR", tempfile.mkdtemp(prefix="feature_cache_"))
+        if args.no_cache:
+            os.environ["FEATURE_CACHE_ENABLED"] = "0"
+
+        import fake_astra
+        fake_astra.configure(args.collections, latency=args.latency, page_size=args.page_size)
+        import model_endpoints
+        if args.stub_models:
+            install_stub_models(model_endpoints)
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=model_endpoints.app),
+                                   base_url="http://load-test", timeout=args.timeout)
+        monitor = LoopLagMonitor()
+        monitor.start()
+
+    async with client:
+        results, elapsed = await run_load(client, endpoints, weights, collections, args.concurrency,
+                                          args.duration, args.requests, args.seed)
+    if monitor:
+        await monitor.stop()
+    print_report(results, elapsed, monitor.report() if monitor else "n/a (remote server)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--collections", default="synthetic_1k:1000,synthetic_10k:10000",
+                        help="name:rows pairs (in-process) or existing collection names (--url)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight pairs")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run (0 to use --requests)")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests (0 for no limit)")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake backend seconds per page")
+    parser.add_argument("--page-size", type=int, default=20, help="Fake backend documents per page")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--stub-models", action="store_true", help="Use stand-in models when model files are missing")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk feature cache")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
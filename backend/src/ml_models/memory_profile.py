@@ -0,0 +1,240 @@
+import contextvars
+import os
+import random
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from fastapi import HTTPException
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# "" (off), "rss" (RSS deltas per stage) or "tracemalloc" (RSS + Python allocation tracing)
+MEMORY_PROFILE = os.getenv("MEMORY_PROFILE", "").lower()
+# Per-request budgets; 0 disables a limit
+MAX_ROWS_PER_REQUEST = int(os.getenv("MAX_ROWS_PER_REQUEST", 0))
+MAX_REQUEST_MEMORY_MB = float(os.getenv("MAX_REQUEST_MEMORY_MB", 0))
+BUDGET_ACTION = os.getenv("BUDGET_ACTION", "reject").lower()  # "reject" or "downsample"
+
+_recent_profiles = deque(maxlen=int(os.getenv("MEMORY_PROFILE_HISTORY", 50)))
+_current = contextvars.ContextVar("memory_profile", default=None)
+
+if MEMORY_PROFILE == "tracemalloc" and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+class BudgetExceeded(HTTPException):
+    """A request would use more rows or memory than the configured budget"""
+
+    def __init__(self, detail):
+        super().__init__(status_code=413, detail=detail)
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unavailable"""
+    if psutil:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _mb(value):
+    return None if value is None else round(value / (1024 * 1024), 2)
+
+
+class RequestMemoryProfile:
+    """Memory usage of one request, broken down by pipeline stage"""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self.rss_start = current_rss()
+        self.rss_end = None
+        self.rss_peak = self.rss_start
+        self.stages = []
+        self.rows = None
+        self.downsampled_from = None
+
+    def record(self, name, rss_before, rss_after, traced_delta, traced_peak, seconds):
+        if rss_after is not None and (self.rss_peak is None or rss_after > self.rss_peak):
+            self.rss_peak = rss_after
+        self.stages.append({
+            "stage": name,
+            "rss_delta_mb": _mb(rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+            "traced_delta_mb": _mb(traced_delta),
+            "traced_peak_mb": _mb(traced_peak),
+            "seconds": round(seconds, 4),
+        })
+
+    def growth(self):
+        """RSS growth since the request started, in bytes"""
+        if self.rss_start is None or self.rss_peak is None:
+            return 0
+        return self.rss_peak - self.rss_start
+
+    def finish(self):
+        self.rss_end = current_rss()
+        return self
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "path": self.path,
+            "started": self.started,
+            "rows": self.rows,
+            "downsampled_from": self.downsampled_from,
+            "rss_start_mb": _mb(self.rss_start),
+            "rss_end_mb": _mb(self.rss_end),
+            "rss_growth_mb": _mb(self.growth()),
+            "stages": self.stages,
+        }
+
+    def summary(self):
+        stages = ", ".join(f"{s['stage']} {s['rss_delta_mb']:+.1f}MB" for s in self.stages if s["rss_delta_mb"] is not None)
+        return f"🧠 {self.method} {self.path}: rss growth {_mb(self.growth())}MB ({stages or 'no stages'})"
+
+
+def profiling_requested(http_request):
+    """Whether to profile this request (globally enabled, or X-Memory-Profile header)"""
+    return bool(MEMORY_PROFILE) or http_request.headers.get("x-memory-profile", "") in ("1", "true")
+
+
+@contextmanager
+def profile_request(method, path, keep=True):
+    """
+    Collect a RequestMemoryProfile for the enclosed request, then log and keep it.
+
+    With keep=False the profile only serves as the request's baseline for
+    MAX_REQUEST_MEMORY_MB and is neither logged nor kept.
+    """
+    profile = RequestMemoryProfile(method, path)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+        if keep:
+            profile.finish()
+            _recent_profiles.append(profile.to_dict())
+            print(profile.summary())
+
+
+@contextmanager
+def memory_stage(name):
+    """
+    Record memory used by one pipeline stage of the current request.
+
+    A no-op unless the request is being profiled or a memory budget is set.
+    Raises BudgetExceeded when the request's RSS growth since it started (or,
+    outside a request, this stage's growth) passes MAX_REQUEST_MEMORY_MB.
+    """
+    profile = _current.get()
+    if profile is None and not MAX_REQUEST_MEMORY_MB:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        traced_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    rss_before = current_rss()
+    start = time.perf_counter()
+    yield
+    rss_after = current_rss()
+    traced_delta = traced_peak = None
+    if tracing:
+        traced_after, traced_peak = tracemalloc.get_traced_memory()
+        traced_delta, traced_peak = traced_after - traced_before, traced_peak - traced_before
+
+    if profile is not None:
+        profile.record(name, rss_before, rss_after, traced_delta, traced_peak, time.perf_counter() - start)
+        growth = profile.growth()
+    else:
+        growth = (rss_after - rss_before) if rss_before is not None and rss_after is not None else 0
+
+    if MAX_REQUEST_MEMORY_MB and growth > MAX_REQUEST_MEMORY_MB * 1024 * 1024:
+        raise BudgetExceeded(
+            f"Request used {_mb(growth)}MB after '{name}', over the {MAX_REQUEST_MEMORY_MB}MB budget"
+        )
+
+
+class DownsampledDocs(list):
+    """Documents kept by read_within_budget(), remembering how many were read"""
+
+    def __init__(self, docs, total):
+        super().__init__(docs)
+        self.total = total
+
+
+def read_within_budget(cursor, max_rows=None, seed=42):
+    """
+    Read documents from a cursor, enforcing the per-request row budget.
+
+    With BUDGET_ACTION="reject" reading stops as soon as the budget is passed
+    and BudgetExceeded is raised. With "downsample" the rest of the cursor is
+    streamed through a reservoir sample, so at most max_rows documents are
+    ever held in memory.
+    """
+    max_rows = MAX_ROWS_PER_REQUEST if max_rows is None else max_rows
+    if not max_rows:
+        return list(cursor)
+
+    reservoir = []
+    rng = random.Random(seed)
+    seen = 0
+    for doc in cursor:
+        seen += 1
+        if seen <= max_rows:
+            reservoir.append(doc)
+            continue
+        if BUDGET_ACTION != "downsample":
+            raise BudgetExceeded(f"Collection has more than {max_rows} posts, over the per-request budget")
+        j = rng.randrange(seen)
+        if j < max_rows:
+            reservoir[j] = doc
+
+    if seen > max_rows:
+        print(f"⚠️ Downsampled {seen} posts to {max_rows} to stay within the per-request budget")
+        profile = _current.get()
+        if profile is not None:
+            profile.downsampled_from = seen
+        return DownsampledDocs(reservoir, seen)
+    return reservoir
+
+
+def note_rows(rows):
+    """Attach the number of rows processed to the current profile"""
+    profile = _current.get()
+    if profile is not None:
+        profile.rows = rows
+
+
+def debug_snapshot(top=10):
+    """Current memory state and recent request profiles, for the debug endpoint"""
+    snapshot = {
+        "rss_mb": _mb(current_rss()),
+        "profiling": MEMORY_PROFILE or "off (send X-Memory-Profile: 1 to profile a request)",
+        "budget": {
+            "max_rows_per_request": MAX_ROWS_PER_REQUEST or None,
+            "max_request_memory_mb": MAX_REQUEST_MEMORY_MB or None,
+            "action": BUDGET_ACTION,
+        },
+        "recent_requests": list(_recent_profiles),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:top]
+        snapshot["tracemalloc"] = {
+            "current_mb": _mb(current),
+            "peak_mb": _mb(peak),
+            "top_allocations": [{"location": str(stat.traceback), "size_mb": _mb(stat.size), "count": stat.count}
+                                for stat in stats],
+        }
+    return snapshot
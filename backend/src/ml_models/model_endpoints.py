@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal
 from astrapy import DataAPIClient
 import os
 import asyncio
@@ -14,6 +15,19 @@ from sklearn.cluster import KMeans
 from dotenv import load_dotenv
 import warnings
 from collections import Counter
+from itertools import islice
+from response_encoding import FastJSONResponse, frame_to_payload
+from streaming_rank import StreamingTopK
+import feature_cache
+import request_control
+import memory_profile
+from memory_profile import memory_stage, read_within_budget
+from request_control import run_coalesced
+import caption_search
+import what_if
+from account_comparison import compare_accounts
+from model_lookup import build_lookup
+from engagement_trends import compute_trend_buckets, build_trend_report, get_cached_buckets, cache_buckets, invalidate_trends
 warnings.filterwarnings('ignore')
 
 load_dotenv()
@@ -21,14 +35,22 @@ load_dotenv()
 # Configuration
 ASTRA_DB_TOKEN = os.getenv('ASTRA_DB_TOKEN')
 ASTRA_DB_URL = os.getenv('ASTRA_DB_URL')
+if os.getenv('FAKE_ASTRA_DB') == '1':
+    # Synthetic in-process collections for offline performance testing (see fake_astra.py)
+    from fake_astra import FakeDataAPIClient as DataAPIClient
+    print("⚠️ Using the fake AstraDB backend (FAKE_ASTRA_DB=1)")
 ENGAGEMENT_MODEL_DIR = './engagement/'  # Directory for engagement models
 PERFORMANCE_MODEL_DIR = './performance/'  # Directory for performance ranking models
+STREAM_PAGE_SIZE = int(os.getenv('STREAM_PAGE_SIZE', 1000))  # Documents per page in streaming mode
+MAX_COMPARE_COLLECTIONS = int(os.getenv('MAX_COMPARE_COLLECTIONS', 10))  # Accounts per /compare request
+MAX_COMPARE_TOP_POSTS = int(os.getenv('MAX_COMPARE_TOP_POSTS', 50))  # Upper bound for /compare k
 
 # Create FastAPI app
 app = FastAPI(
     title="Instagram Post Analysis API",
     description="API for analyzing Instagram posts and predicting performance",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Enable CORS
@@ -40,10 +62,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request memory profiling (MEMORY_PROFILE env or X-Memory-Profile header)
+@app.middleware("http")
+async def memory_profiling(request: Request, call_next):
+    profiled = memory_profile.profiling_requested(request)
+    if not profiled and not memory_profile.MAX_REQUEST_MEMORY_MB:
+        return await call_next(request)
+    # Without profiling the request is still tracked, so the memory budget is per request
+    with memory_profile.profile_request(request.method, request.url.path, keep=profiled):
+        return await call_next(request)
+
 # Request body models
 class RequestBody(BaseModel):
     container_id: str = None
     collection_name: str = None
+    orient: Literal["records", "columns"] = "records"  # "records" (list of rows) or "columns" (dict of column arrays)
+
+class TopPostsRequest(RequestBody):
+    mode: Literal["exact", "streaming"] = "exact"  # "exact" (max-normalized, whole frame) or "streaming" (percentile sketches, bounded memory)
+    k: int = Field(5, ge=1)  # Number of top posts to return
+    page_size: int = Field(None, ge=1)  # Documents per page in streaming mode
+
+class SearchRequest(RequestBody):
+    query: str = None  # Free-text query
+    queries: List[str] = None  # Several queries, scored in one batch
+    post_ids: List[str] = None  # Find posts similar to these posts
+    similar_to_best: bool = False  # Find posts similar to the most engaging post
+    k: int = Field(10, ge=1)  # Results per query
+
+class CompareRequest(BaseModel):
+    collections: List[str]  # One collection per account
+    k: int = Field(3, ge=1, le=MAX_COMPARE_TOP_POSTS)  # Top posts per account
+    orient: Literal["records", "columns"] = "records"  # "records" (list of rows) or "columns" (dict of column arrays)
+
+class WhatIfRequest(BaseModel):
+    # Candidate values per engagement feature; omitted features use what_if.DEFAULT_GRID
+    hour: List[Annotated[int, Field(ge=0, le=23)]] = None
+    day_of_week_encoded: List[Annotated[int, Field(ge=0, le=6)]] = None  # 0 = Monday
+    hashtag_count: List[Annotated[int, Field(ge=0)]] = None
+    caption_length: List[Annotated[int, Field(ge=0)]] = None
+    mentions_count: List[Annotated[int, Field(ge=0)]] = None
+    caption_sentiment: List[Annotated[float, Field(ge=-1, le=1)]] = None  # TextBlob polarity
+    top_n: int = Field(10, ge=1, le=what_if.MAX_TOP_N)  # Number of best combinations to return
+
+class TrendRequest(RequestBody):
+    frequency: Literal["day", "week", "month"] = "day"
+    window: int = Field(7, ge=1)  # Rolling window, in buckets
+    max_points: int = Field(None, ge=1)  # Downsample each series to at most this many points
+    refresh: bool = False  # Drop cached buckets for this collection (all frequencies) and recompute
 
 # Load both sets of models at startup
 engagement_models = {}
@@ -78,6 +144,27 @@ except Exception as e:
     print(f"Looking in: {os.path.abspath(PERFORMANCE_MODEL_DIR)}")
     print("Top posts ranking functionality may be limited")
 
+# Cached features/predictions are keyed by this, so retrained models never see stale entries
+MODEL_VERSION = feature_cache.model_version(ENGAGEMENT_MODEL_DIR, PERFORMANCE_MODEL_DIR)
+print(f"Model version: {MODEL_VERSION}")
+
+# Performance models only see 'interaction', so their outputs can be precomputed: exactly
+# between split thresholds for tree models, on an interpolated grid otherwise
+# (set PERFORMANCE_LOOKUP=0 to always call the models)
+performance_lookup = {}
+if os.getenv('PERFORMANCE_LOOKUP', '1') != '0':
+    for target, model in list(performance_models.items()):
+        try:
+            lookup, info = build_lookup(model)
+        except Exception as e:
+            lookup, info = None, {"enabled": False, "reason": str(e)}
+        performance_lookup[target] = info
+        if lookup is not None:
+            performance_models[target] = lookup
+            print(f"✅ {target} {info['kind']} lookup table built ({info['table_size']} entries, error ratio {info['max_error_ratio']})")
+        else:
+            print(f"⚠️ {target} lookup disabled ({info['reason']}), predicting with the model directly")
+
 # Database connection
 async def connectDB():
     """Connect to AstraDB database"""
@@ -98,12 +185,42 @@ async def fetch_data(container_id):
             raise Exception("Database connection failed")
         collection = await asyncio.to_thread(database.get_collection, container_id)
         cursor = await asyncio.to_thread(collection.find)
-        data = await asyncio.to_thread(list, cursor)
-        return pd.DataFrame(data) if data else pd.DataFrame()
+        with memory_stage("fetch_docs"):
+            # Rejects or reservoir-samples collections over MAX_ROWS_PER_REQUEST while reading
+            data = await asyncio.to_thread(read_within_budget, cursor)
+        with memory_stage("build_frame"):
+            df = pd.DataFrame(data) if data else pd.DataFrame()
+        if isinstance(data, memory_profile.DownsampledDocs):
+            df.attrs["downsampled_from"] = data.total
+        memory_profile.note_rows(len(df))
+        return df
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Data fetch error: {e}")
         return pd.DataFrame()
 
+async def fetch_pages(container_id, page_size=STREAM_PAGE_SIZE):
+    """
+    Yield data from specified collection as DataFrames of at most page_size rows.
+    
+    Raises HTTPException 503 if the database is unreachable and 404 if the
+    collection can't be read, matching what fetch_data() callers return.
+    """
+    database = await connectDB()
+    if not database:
+        raise HTTPException(status_code=503, detail="Database connection failed")
+    try:
+        collection = await asyncio.to_thread(database.get_collection, container_id)
+        cursor = await asyncio.to_thread(collection.find)
+        page = await asyncio.to_thread(lambda: list(islice(cursor, page_size)))
+    except Exception as e:
+        print(f"Data fetch error: {e}")
+        raise HTTPException(status_code=404, detail=f"No data found in collection: {container_id}")
+    while page:
+        yield pd.DataFrame(page)
+        page = await asyncio.to_thread(lambda: list(islice(cursor, page_size)))
+
 # Data preprocessing functions
 def preprocess_for_engagement(data):
     """Preprocess data for engagement prediction models"""
@@ -148,12 +265,16 @@ def preprocess_for_performance(data):
     
     return data
 
-def recommend_next_post(data_from_db):
-    """Recommend next post type based on engagement predictions"""
-    if not engagement_models or not engagement_scaler:
-        return {"error": "Engagement prediction models not available"}
+def predict_engagement(data_from_db):
+    """
+    Compute engagement features and predictions for every post.
     
-    recent_data = preprocess_for_engagement(data_from_db)
+    Returns:
+        dict with 'features' (scaled feature matrix), 'predicted_likesCount',
+        'predicted_commentsCount' and, if available, 'type'
+    """
+    with memory_stage("preprocess"):
+        recent_data = preprocess_for_engagement(data_from_db)
     
     feature_columns = ['caption_length', 'hour', 'hashtag_count', 'mentions_count', 
                        'day_of_week_encoded', 'caption_sentiment']
@@ -163,22 +284,35 @@ def recommend_next_post(data_from_db):
         if col not in recent_data.columns:
             recent_data[col] = 0
 
-    # Scale features using the engagement scaler
-    X_scaled = engagement_scaler.transform(recent_data[feature_columns])
-    
-    # Make predictions using engagement models
-    likes_predictions = np.expm1(engagement_models["likesCount"].predict(X_scaled))
-    comments_predictions = np.expm1(engagement_models["commentsCount"].predict(X_scaled))
+    with memory_stage("predict"):
+        # Scale features using the engagement scaler
+        X_scaled = engagement_scaler.transform(recent_data[feature_columns])
+        
+        # Make predictions using engagement models
+        predictions = {
+            "features": X_scaled,
+            "predicted_likesCount": np.expm1(engagement_models["likesCount"].predict(X_scaled)),
+            "predicted_commentsCount": np.expm1(engagement_models["commentsCount"].predict(X_scaled)),
+        }
+    if 'type' in recent_data.columns:
+        predictions["type"] = recent_data['type'].fillna("").astype(str).to_numpy()
+    return predictions
+
+def summarize_recommendations(predictions):
+    """Average predicted engagement per post type, best type first"""
+    likes_predictions = np.asarray(predictions["predicted_likesCount"])
+    comments_predictions = np.asarray(predictions["predicted_commentsCount"])
+    types = np.asarray(predictions["type"]) if "type" in predictions else None
 
     # Analyze by post type
-    post_types = recent_data['type'].unique().tolist() if 'type' in recent_data.columns else ['Image', 'Video', 'Sidecar']
+    post_types = [t for t in pd.unique(types) if t] if types is not None else []
     if not post_types:
         post_types = ['Image', 'Video', 'Sidecar']
         
     recommendations = {}
 
     for post_type in post_types:
-        post_indices = (recent_data['type'] == post_type).to_numpy() if 'type' in recent_data.columns else []
+        post_indices = (types == post_type) if types is not None else np.zeros(len(likes_predictions), dtype=bool)
         
         avg_likes = likes_predictions[post_indices].mean() if post_indices.any() else 0
         avg_comments = comments_predictions[post_indices].mean() if post_indices.any() else 0
@@ -192,33 +326,35 @@ def recommend_next_post(data_from_db):
 
     return dict(sorted(recommendations.items(), key=lambda x: x[1]['engagement_score'], reverse=True))
 
-def get_top_5_posts(df_data):
+def recommend_next_post(data_from_db):
+    """Recommend next post type based on engagement predictions"""
+    if not engagement_models or not engagement_scaler:
+        return {"error": "Engagement prediction models not available"}
+    
+    return summarize_recommendations(predict_engagement(data_from_db))
+
+def predict_performance(df_data, log_targets=None, verbose=True):
     """
-    Get top 5 performing posts based on trained models.
+    Add predicted_<target> columns using the performance models.
     
     Args:
         df_data: DataFrame containing posts data
+        log_targets: Optional dict of target -> whether the model predicts log values.
+            Missing entries are detected from the predictions and stored, so
+            successive pages of one collection are transformed consistently.
+        verbose: Print per-target prediction ranges
     
     Returns:
-        DataFrame containing top 5 posts and their metrics
+        Copy of df_data with predicted_likesCount, predicted_commentsCount and predicted_reach
     """
-    if not performance_models:
-        return pd.DataFrame(columns=["_id", "caption", "performance_score"])
+    log_targets = {} if log_targets is None else log_targets
     
-    print(f"Processing {len(df_data)} posts...")
+    with memory_stage("preprocess"):
+        # Create a working copy of the data
+        df_original = df_data.copy()
+        df = preprocess_for_performance(df_data)
     
-    if df_data.empty:
-        print("Warning: Empty dataset provided")
-        return pd.DataFrame()
-    
-    # Create a working copy of the data
-    df_original = df_data.copy()
-    df = preprocess_for_performance(df_data)
-    
-    try:
-        # Performance models are designed to use 'interaction' feature
-        print("Using 'interaction' feature for performance predictions")
-        
+    with memory_stage("predict"):
         # Make predictions using performance models
         for target in ["likesCount", "commentsCount", "reach"]:
             try:
@@ -227,21 +363,25 @@ def get_top_5_posts(df_data):
                     predictions = performance_models[target].predict(df[['interaction']])
                     
                     # Transform predictions if needed
-                    if np.all(predictions < 20):  # Log-transformed
+                    if target not in log_targets:
+                        log_targets[target] = bool(np.all(predictions < 20))  # Log-transformed
+                    if log_targets[target]:
                         predictions = np.expm1(predictions)
                     
                     # Ensure no negative values
                     predictions = np.maximum(0, predictions)
                     
                     df_original[f"predicted_{target}"] = predictions
-                    print(f"✓ {target} predictions: min={predictions.min():.2f}, max={predictions.max():.2f}")
+                    if verbose:
+                        print(f"✓ {target} predictions: min={predictions.min():.2f}, max={predictions.max():.2f}")
                 else:
                     # Handle missing models with reasonable approximations
                     if target == "reach":
                         # If we have likes and comments predictions, use them to approximate reach
                         if all(col in df_original.columns for col in ["predicted_likesCount", "predicted_commentsCount"]):
                             df_original["predicted_reach"] = df_original["predicted_likesCount"] * 5 + df_original["predicted_commentsCount"] * 10
-                            print("✓ Approximated reach based on other predictions")
+                            if verbose:
+                                print("✓ Approximated reach based on other predictions")
                         else:
                             df_original["predicted_reach"] = np.random.lognormal(8, 1, size=len(df_original))
                             print("⚠️ Using random values for reach")
@@ -256,35 +396,77 @@ def get_top_5_posts(df_data):
                 else:
                     df_original[f"predicted_{target}"] = np.random.lognormal(4, 1, size=len(df_original))
         
-        # Calculate performance score
-        max_likes = max(df_original["predicted_likesCount"].max(), 1)
-        max_comments = max(df_original["predicted_commentsCount"].max(), 1)
-        max_reach = max(df_original.get("predicted_reach", pd.Series([1] * len(df_original))).max(), 1)
-        
-        df_original["performance_score"] = (
-            0.5 * df_original["predicted_likesCount"] / max_likes +
-            0.3 * df_original["predicted_commentsCount"] / max_comments +
-            0.2 * df_original.get("predicted_reach", pd.Series([1] * len(df_original))) / max_reach
-        )
-        
-        # Get top 5 posts
-        top_posts = df_original.nlargest(5, "performance_score")
-        
-        # Select columns for return
-        base_columns = ["performance_score", "predicted_likesCount", "predicted_commentsCount"]
-        if "predicted_reach" in df_original.columns:
-            base_columns.append("predicted_reach")
-        
-        # Add other columns if available
-        optional_columns = []
-        for col in ["_id", "type", "caption", "timestamp", "media_url", "likesCount", "commentsCount"]:
-            if col in top_posts.columns:
-                optional_columns.append(col)
-        
-        result_columns = optional_columns + base_columns
+    
+    return df_original
+
+def rank_top_posts(df_original, k=5):
+    """
+    Score posts that already have predicted_<target> columns and keep the best k.
+    
+    Args:
+        df_original: DataFrame with predicted_likesCount, predicted_commentsCount
+            and optionally predicted_reach
+        k: Number of top posts to return
+    
+    Returns:
+        DataFrame containing top k posts and their metrics
+    """
+    # Calculate performance score
+    max_likes = max(df_original["predicted_likesCount"].max(), 1)
+    max_comments = max(df_original["predicted_commentsCount"].max(), 1)
+    max_reach = max(df_original.get("predicted_reach", pd.Series([1] * len(df_original))).max(), 1)
+
+    df_original["performance_score"] = (
+        0.5 * df_original["predicted_likesCount"] / max_likes +
+        0.3 * df_original["predicted_commentsCount"] / max_comments +
+        0.2 * df_original.get("predicted_reach", pd.Series([1] * len(df_original))) / max_reach
+    )
+
+    # Get top k posts
+    top_posts = df_original.nlargest(k, "performance_score")
+
+    # Select columns for return
+    base_columns = ["performance_score", "predicted_likesCount", "predicted_commentsCount"]
+    if "predicted_reach" in df_original.columns:
+        base_columns.append("predicted_reach")
+
+    # Add other columns if available
+    optional_columns = []
+    for col in ["_id", "type", "caption", "timestamp", "media_url", "likesCount", "commentsCount"]:
+        if col in top_posts.columns:
+            optional_columns.append(col)
+
+    result_columns = optional_columns + base_columns
+
+    print(f"Top post identified with score: {top_posts['performance_score'].max():.2f}")
+    return top_posts[result_columns]
+
+def get_top_5_posts(df_data, k=5):
+    """
+    Get top 5 performing posts based on trained models.
+    
+    Args:
+        df_data: DataFrame containing posts data
+        k: Number of top posts to return
+    
+    Returns:
+        DataFrame containing top 5 posts and their metrics
+    """
+    if not performance_models:
+        return pd.DataFrame(columns=["_id", "caption", "performance_score"])
+    
+    print(f"Processing {len(df_data)} posts...")
+    
+    if df_data.empty:
+        print("Warning: Empty dataset provided")
+        return pd.DataFrame()
+    
+    try:
+        # Performance models are designed to use 'interaction' feature
+        print("Using 'interaction' feature for performance predictions")
+        df_original = predict_performance(df_data)
         
-        print(f"Top post identified with score: {top_posts['performance_score'].max():.2f}")
-        return top_posts[result_columns]
+        return rank_top_posts(df_original, k)
         
     except Exception as e:
         print(f"Error in get_top_5_posts: {str(e)}")
@@ -292,22 +474,38 @@ def get_top_5_posts(df_data):
         traceback.print_exc()
         # Return empty DataFrame with expected columns
         return pd.DataFrame(columns=["_id", "caption", "performance_score"])
+
+async def get_top_posts_streaming(collection_id, k=5, page_size=None):
+    """
+    Rank posts in a single pass over pages from the database, with bounded memory.
     
-def convert_numpy_types(obj):
-    if isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {k: convert_numpy_types(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(i) for i in obj]
-    else:
-        return obj
+    Scores are percentile-normalized against streaming quantile sketches of the
+    predicted metrics instead of being divided by the maximum of the full frame.
+    
+    Args:
+        collection_id: Collection to rank
+        k: Number of top posts to return
+        page_size: Documents fetched per page
+    
+    Returns:
+        (DataFrame containing top k posts and their metrics, sketch summary dict)
+    """
+    keep_columns = ["_id", "type", "caption", "timestamp", "media_url", "likesCount", "commentsCount",
+                    "predicted_likesCount", "predicted_commentsCount", "predicted_reach"]
+    ranker = StreamingTopK(k=k, keep_columns=keep_columns)
+    log_targets = {}
+    
+    async for page in fetch_pages(collection_id, page_size or STREAM_PAGE_SIZE):
+        ranker.push(predict_performance(page, log_targets=log_targets, verbose=False))
+    
+    summary = ranker.summary()
+    print(f"Streamed {summary['rows_seen']} posts, kept {summary['candidates_kept']} candidates")
+    
+    top_posts = ranker.result()
+    if not top_posts.empty:
+        print(f"Top post identified with score: {top_posts['performance_score'].max():.2f}")
+    return top_posts, summary
     
-       
 def process_instagram_data(data: pd.DataFrame):
     # Make sure we have the required columns
     required_columns = ['likesCount', 'timestamp', 'commentsCount']
@@ -338,6 +536,54 @@ def process_instagram_data(data: pd.DataFrame):
     return peak_times, datafinal
 
 
+# Columns kept in the on-disk cache for top post ranking
+PERFORMANCE_CACHE_COLUMNS = ["_id", "type", "caption", "timestamp", "media_url", "likesCount", "commentsCount",
+                             "predicted_likesCount", "predicted_commentsCount", "predicted_reach"]
+
+async def load_engagement_predictions(collection_id):
+    """Engagement features and predictions for a collection, from the shared disk cache when possible"""
+    cached = await asyncio.to_thread(feature_cache.load, collection_id, "engagement", MODEL_VERSION)
+    if cached is not None:
+        print(f"💾 Loaded cached engagement predictions for {len(cached['predicted_likesCount'])} posts")
+        return cached
+    
+    data_from_db = await fetch_data(collection_id)
+    if data_from_db.empty:
+        return None
+    
+    print(f"Found {len(data_from_db)} rows of data")
+    predictions = predict_engagement(data_from_db)
+    # Downsampled collections are not cached, so other workers never see a partial result
+    if data_from_db.attrs.get("downsampled_from"):
+        predictions["downsampled_from"] = data_from_db.attrs["downsampled_from"]
+    else:
+        await asyncio.to_thread(feature_cache.store, collection_id, "engagement", MODEL_VERSION, predictions)
+    return predictions
+
+async def load_performance_predictions(collection_id):
+    """Posts with performance predictions for a collection, from the shared disk cache when possible"""
+    cached = await asyncio.to_thread(feature_cache.load, collection_id, "performance", MODEL_VERSION)
+    if cached is not None:
+        print(f"💾 Loaded cached performance predictions for {len(cached['predicted_likesCount'])} posts")
+        # copy=False keeps numeric columns backed by the memory-mapped files
+        return pd.DataFrame(cached, copy=False)
+    
+    data_from_db = await fetch_data(collection_id)
+    if data_from_db.empty:
+        return data_from_db
+    
+    print(f"Found {len(data_from_db)} posts to analyze")
+    print("Using 'interaction' feature for performance predictions")
+    df_original = predict_performance(data_from_db)
+    
+    # Fallback predictions are random and downsampled collections partial, so only cache real, complete output
+    if ("likesCount" in performance_models and "commentsCount" in performance_models
+            and not data_from_db.attrs.get("downsampled_from")):
+        await asyncio.to_thread(feature_cache.store, collection_id, "performance", MODEL_VERSION,
+                                {col: df_original[col].to_numpy() for col in PERFORMANCE_CACHE_COLUMNS if col in df_original.columns})
+    return df_original
+
+
 # ----- API ENDPOINTS ----
 
 @app.get("/health")
@@ -347,9 +593,18 @@ async def health_check():
         "status": "healthy",
         "engagement_models": list(engagement_models.keys()) if engagement_models else [],
         "performance_models": list(performance_models.keys()) if performance_models else [],
+        "model_version": MODEL_VERSION,
+        "performance_lookup": performance_lookup,
+        "feature_cache": feature_cache.stats(),
+        "load": request_control.stats(),
         "timestamp": str(pd.Timestamp.now())
     }
 
+@app.get("/debug/memory")
+async def debug_memory():
+    """Process memory, allocation hot spots (with MEMORY_PROFILE=tracemalloc) and recent request profiles"""
+    return FastJSONResponse(memory_profile.debug_snapshot())
+
 @app.get("/collections")
 async def list_collections():
     """List all available collections"""
@@ -365,7 +620,7 @@ async def list_collections():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/recommend")
-async def get_recommendations(request: RequestBody):
+async def get_recommendations(request: RequestBody, http_request: Request):
     """Get recommendations for next post type using engagement models"""
     try:
         # Check if engagement models are loaded
@@ -379,21 +634,30 @@ async def get_recommendations(request: RequestBody):
             raise HTTPException(status_code=400, detail="Missing collection identifier. Please provide either container_id or collection_name")
             
         print(f"Received recommendation request for collection: {collection_id}")
-        data_from_db = await fetch_data(collection_id)
         
-        if not data_from_db.empty:
-            print(f"Found {len(data_from_db)} rows of data")
-            recommendations = recommend_next_post(data_from_db)
-            return {"status": "success", "recommendations": recommendations}
-        else:
-            print("No data found in database")
-            raise HTTPException(status_code=404, detail="No data available")
+        async def compute():
+            predictions = await load_engagement_predictions(collection_id)
+            
+            if predictions is not None:
+                recommendations = summarize_recommendations(predictions)
+                response = {"status": "success", "recommendations": recommendations}
+                if predictions.get("downsampled_from"):
+                    response["downsampled_from"] = predictions["downsampled_from"]
+                return FastJSONResponse(response)
+            else:
+                print("No data found in database")
+                raise HTTPException(status_code=404, detail="No data available")
+        
+        # Identical in-flight requests share one pipeline run
+        return await run_coalesced(http_request, ("recommend", collection_id), compute)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_recommendations: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/top5_posts")
-async def top5_posts(request: RequestBody):
+async def top5_posts(request: TopPostsRequest, http_request: Request):
     """Get top 5 posts based on predicted performance using performance models"""
     try:
         # Check if performance models are loaded
@@ -408,58 +672,63 @@ async def top5_posts(request: RequestBody):
             
         print(f"📊 Analyzing top posts for collection: {collection_id}")
         
-        # Fetch data
-        data_from_db = await fetch_data(collection_id)
-        
-        if data_from_db.empty:
-            print("No data found in database")
-            raise HTTPException(status_code=404, detail="No data available")
-        
-        print(f"Found {len(data_from_db)} posts to analyze")
-        
-        # Get top posts
-        top_posts = get_top_5_posts(data_from_db)
-        
-        if top_posts is None or top_posts.empty:
-            raise HTTPException(status_code=500, detail="Failed to identify top posts")
-        
-        # Prepare for JSON serialization
-        top_posts_dict = top_posts.copy()
-        
-        # REMOVE prediction columns - only keep performance_score
-        columns_to_keep = [col for col in top_posts_dict.columns if not col.startswith('predicted_') or col == 'performance_score']
-        top_posts_dict = top_posts_dict[columns_to_keep]
-        
-        # Rename performance_score for clarity
-        if 'performance_score' in top_posts_dict.columns:
-            top_posts_dict = top_posts_dict.rename(columns={'performance_score': 'engagement_score'})
-        
-        # Convert timestamp to string if present
-        if "timestamp" in top_posts_dict.columns:
-            top_posts_dict["timestamp"] = top_posts_dict["timestamp"].astype(str)
+        async def compute():
+            sketch_summary = None
+            downsampled_from = None
+            if request.mode == "streaming":
+                # Single pass over pages with bounded memory
+                top_posts, sketch_summary = await get_top_posts_streaming(collection_id, k=request.k, page_size=request.page_size)
+                
+                if sketch_summary["rows_seen"] == 0:
+                    print("No data found in database")
+                    raise HTTPException(status_code=404, detail="No data available")
+            else:
+                # Fetch data and predictions (or reuse them from the shared disk cache)
+                df_original = await load_performance_predictions(collection_id)
+                
+                if df_original.empty:
+                    print("No data found in database")
+                    raise HTTPException(status_code=404, detail="No data available")
+                downsampled_from = df_original.attrs.get("downsampled_from")
+                
+                # Get top posts
+                with memory_stage("rank"):
+                    top_posts = rank_top_posts(df_original, k=request.k)
             
-        # Round numerical values
-        for col in top_posts_dict.columns:
-            if col not in ["_id", "caption", "timestamp", "type", "media_url"]:
-                if pd.api.types.is_numeric_dtype(top_posts_dict[col]):
-                    top_posts_dict[col] = top_posts_dict[col].round(2).fillna(0)
-        
-        # Reorder columns for nicer presentation
-        preferred_column_order = ["_id", "type", "engagement_score", "timestamp", "caption", "media_url", "likesCount", "commentsCount"]
-        available_columns = [col for col in preferred_column_order if col in top_posts_dict.columns]
-        other_columns = [col for col in top_posts_dict.columns if col not in preferred_column_order]
-        
-        # Set final column order using available preferred columns first, then any remaining columns
-        top_posts_dict = top_posts_dict[available_columns + other_columns]
-        
-        result = top_posts_dict.to_dict(orient="records")
-        
-        return {
-            "status": "success", 
-            "message": f"Found {len(result)} top posts", 
-            "top_posts": result
-        }
+            if top_posts is None or top_posts.empty:
+                raise HTTPException(status_code=500, detail="Failed to identify top posts")
+            
+            # REMOVE prediction columns - only keep performance_score
+            columns_to_keep = [col for col in top_posts.columns if not col.startswith('predicted_') or col == 'performance_score']
+            top_posts = top_posts[columns_to_keep].rename(columns={'performance_score': 'engagement_score'})
+            
+            # Reorder columns for nicer presentation
+            preferred_column_order = ["_id", "type", "engagement_score", "timestamp", "caption", "media_url", "likesCount", "commentsCount"]
+            available_columns = [col for col in preferred_column_order if col in top_posts.columns]
+            other_columns = [col for col in top_posts.columns if col not in preferred_column_order]
+            top_posts = top_posts[available_columns + other_columns]
+            
+            # Round numeric columns, stringify timestamps and emit natively-typed values
+            result = frame_to_payload(top_posts, orient=request.orient)
+            
+            response = {
+                "status": "success", 
+                "message": f"Found {len(top_posts)} top posts", 
+                "top_posts": result
+            }
+            if sketch_summary is not None:
+                response["distribution"] = sketch_summary
+            if downsampled_from:
+                response["downsampled_from"] = downsampled_from
+            
+            return FastJSONResponse(response)
         
+        # Identical in-flight requests share one pipeline run
+        key = ("top5_posts", collection_id, request.mode, request.k, request.page_size, request.orient)
+        return await run_coalesced(http_request, key, compute)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in top5_posts: {str(e)}")
         import traceback
@@ -467,7 +736,7 @@ async def top5_posts(request: RequestBody):
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.post("/posting_time")
-async def analyze(request: RequestBody):
+async def analyze(request: RequestBody, http_request: Request):
     try:
         collection_name = request.collection_name
         
@@ -475,22 +744,208 @@ async def analyze(request: RequestBody):
             raise HTTPException(status_code=400, detail="Collection name is required")
             
         print(f"Analyzing posting times for collection: {collection_name}")
-        data = await fetch_data(collection_name)
         
-        if data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found in collection: {collection_name}")
+        async def compute():
+            data = await fetch_data(collection_name)
+            
+            if data.empty:
+                raise HTTPException(status_code=404, detail=f"No data found in collection: {collection_name}")
+            
+            print(f"Found {len(data)} posts to analyze")
+            with memory_stage("cluster"):
+                peak_times, _ = process_instagram_data(data)
+            
+            response = {
+                "status": "success",
+                "message": f"Analyzed {len(data)} posts",
+                "best_peak_posting_times": peak_times
+            }
+            if data.attrs.get("downsampled_from"):
+                response["downsampled_from"] = data.attrs["downsampled_from"]
+            return FastJSONResponse(response)
+        
+        # Identical in-flight requests share one pipeline run
+        return await run_coalesced(http_request, ("posting_time", collection_name), compute)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error processing data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
+
+@app.post("/engagement_trends")
+async def engagement_trends(request: TrendRequest):
+    """Get bucketed engagement series, rolling means, growth rates and per-type breakdowns"""
+    try:
+        collection_id = request.container_id or request.collection_name
+        
+        if not collection_id:
+            raise HTTPException(status_code=400, detail="Missing collection identifier")
+        
+        if request.refresh:
+            invalidate_trends(collection_id)
+        buckets = get_cached_buckets(collection_id, request.frequency)
+        downsampled_from = None
         
-        print(f"Found {len(data)} posts to analyze")
-        peak_times, _ = process_instagram_data(data)
+        if buckets is None:
+            print(f"📈 Computing {request.frequency} engagement trends for collection: {collection_id}")
+            data = await fetch_data(collection_id)
+            
+            if data.empty:
+                raise HTTPException(status_code=404, detail=f"No data found in collection: {collection_id}")
+            
+            buckets = compute_trend_buckets(data, request.frequency)
+            downsampled_from = data.attrs.get("downsampled_from")
+            # Buckets from a sample understate totals, so only complete collections are cached
+            if not downsampled_from:
+                cache_buckets(collection_id, request.frequency, buckets)
+        else:
+            print(f"📈 Using cached {request.frequency} engagement trends for collection: {collection_id}")
         
-        return {
+        report = build_trend_report(buckets, window=request.window, max_points=request.max_points)
+        
+        return FastJSONResponse({
             "status": "success",
-            "message": f"Analyzed {len(data)} posts",
-            "best_peak_posting_times": convert_numpy_types(peak_times)
-        }
+            "frequency": request.frequency,
+            "window": request.window,
+            **({"downsampled_from": downsampled_from} if downsampled_from else {}),
+            **{name: frame_to_payload(frame, orient=request.orient) for name, frame in report.items()}
+        })
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error processing data: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
+        print(f"Error computing engagement trends: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error computing engagement trends: {str(e)}")
+
+@app.post("/compare")
+async def compare(request: CompareRequest, http_request: Request):
+    """Compare engagement distributions, type mix, peak hours and top posts across several accounts"""
+    try:
+        collections = list(dict.fromkeys(request.collections))  # Drop duplicates, keep order
+        
+        if len(collections) < 2:
+            raise HTTPException(status_code=400, detail="Provide at least two collections to compare")
+        if len(collections) > MAX_COMPARE_COLLECTIONS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_COMPARE_COLLECTIONS} collections can be compared")
+        
+        print(f"⚖️ Comparing {len(collections)} collections: {collections}")
+        
+        async def compute():
+            # Collections load concurrently, each from the shared disk cache when possible
+            frames = await asyncio.gather(*(load_performance_predictions(name) for name in collections))
+            missing = [name for name, frame in zip(collections, frames) if frame.empty]
+            if missing:
+                raise HTTPException(status_code=404, detail=f"No data found in collections: {missing}")
+            
+            with memory_stage("compare"):
+                report = compare_accounts(dict(zip(collections, frames)), k=request.k)
+            downsampled_from = {name: frame.attrs["downsampled_from"] for name, frame in zip(collections, frames)
+                                if frame.attrs.get("downsampled_from")}
+            
+            return FastJSONResponse({
+                "status": "success",
+                "accounts": collections,
+                **({"downsampled_from": downsampled_from} if downsampled_from else {}),
+                **{name: frame_to_payload(frame, orient=request.orient) for name, frame in report.items()}
+            })
+        
+        return await run_coalesced(http_request, ("compare", tuple(collections), request.k, request.orient), compute)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error comparing collections: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error comparing collections: {str(e)}")
+
+@app.post("/what_if")
+async def what_if_scoring(request: WhatIfRequest, http_request: Request):
+    """Score a grid of candidate post settings with the engagement models and return the best combinations"""
+    try:
+        if not engagement_models:
+            raise HTTPException(status_code=503, detail="Engagement prediction models not available")
+        
+        settings = {col: getattr(request, col) for col in what_if.FEATURE_COLUMNS}
+        
+        async def compute():
+            try:
+                # Scoring a large grid is CPU-bound, keep it off the event loop
+                return await asyncio.to_thread(what_if.get_grid_summary, settings, engagement_scaler,
+                                               engagement_models, MODEL_VERSION)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        # The grid doesn't depend on any collection, so identical grids share one scoring run
+        summary, cached = await run_coalesced(http_request, ("what_if", what_if.grid_key(settings)), compute)
+        print(f"🧪 Scored {summary['grid_size']} what-if combinations{' (memoized)' if cached else ''}")
+        
+        return FastJSONResponse({
+            "status": "success",
+            "grid_size": summary["grid_size"],
+            "model_version": MODEL_VERSION,
+            "best_combinations": frame_to_payload(what_if.best_combinations(summary["best"], request.top_n)),
+            "feature_effects": summary["feature_effects"],
+            "feature_importances": what_if.model_importances(engagement_models)
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in what_if_scoring: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error scoring what-if grid: {str(e)}")
+
+@app.post("/search_captions")
+async def search_captions(request: SearchRequest, http_request: Request):
+    """Find posts with similar captions, using a local vector index of the collection"""
+    try:
+        collection_id = request.container_id or request.collection_name
+        
+        if not collection_id:
+            raise HTTPException(status_code=400, detail="Missing collection identifier")
+        
+        queries = request.queries or ([request.query] if request.query else [])
+        post_ids = list(request.post_ids or [])
+        if not queries and not post_ids and not request.similar_to_best:
+            raise HTTPException(status_code=400, detail="Provide query, queries, post_ids or similar_to_best")
+        
+        index = caption_search.get_index(collection_id)
+        if index is None:
+            async def compute():
+                data = await fetch_data(collection_id)
+                
+                if data.empty:
+                    raise HTTPException(status_code=404, detail=f"No data found in collection: {collection_id}")
+                
+                # An index of a sample would miss posts, so it is only cached for complete collections
+                # TF-IDF + SVD is CPU-bound, keep it off the event loop
+                return await asyncio.to_thread(caption_search.build_index, collection_id, data,
+                                               cache=not data.attrs.get("downsampled_from"))
+            
+            # Concurrent searches on a cold collection share one embedding pass
+            index = await run_coalesced(http_request, ("caption_index", collection_id), compute)
+        
+        if request.similar_to_best:
+            post_ids.append(index.best_post_id())
+        
+        results = []
+        if queries:
+            for query, matches in zip(queries, index.search(queries, k=request.k)):
+                results.append({"query": query, "results": frame_to_payload(matches, orient=request.orient)})
+        if post_ids:
+            try:
+                similar = index.similar_to(post_ids, k=request.k)
+            except KeyError as e:
+                raise HTTPException(status_code=404, detail=str(e.args[0]))
+            for post_id, matches in zip(post_ids, similar):
+                results.append({"post_id": post_id, "results": frame_to_payload(matches, orient=request.orient)})
+        
+        return FastJSONResponse({
+            "status": "success",
+            "indexed_posts": len(index),
+            **({"downsampled_from": index.downsampled_from} if index.downsampled_from else {}),
+            "searches": results
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error searching captions: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching captions: {str(e)}")
 
 
 # Run the API
@@ -0,0 +1,200 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Dense grid over the single input feature, uniform in log1p space
+LOOKUP_GRID_SIZE = int(os.getenv("PERFORMANCE_LOOKUP_GRID_SIZE", 8192))
+LOOKUP_MAX_VALUE = float(os.getenv("PERFORMANCE_LOOKUP_MAX_VALUE", 1e9))
+# Accepted interpolation error, measured on the counts the API reports
+LOOKUP_RTOL = float(os.getenv("PERFORMANCE_LOOKUP_RTOL", 0.01))
+LOOKUP_ATOL = float(os.getenv("PERFORMANCE_LOOKUP_ATOL", 0.5))
+LOOKUP_VALIDATION_POINTS = int(os.getenv("PERFORMANCE_LOOKUP_VALIDATION_POINTS", 4096))
+# Tree models with more distinct split thresholds than this are not tabulated
+LOOKUP_MAX_STEPS = int(os.getenv("PERFORMANCE_LOOKUP_MAX_STEPS", 2_000_000))
+
+
+class InterpolatedModel:
+    """
+    Drop-in replacement for a single-feature model, backed by a precomputed table.
+
+    predict() linearly interpolates the model's outputs sampled on a dense grid.
+    The grid is uniform in log1p space, so the cell of each input is computed
+    directly instead of binary-searched. Inputs outside the grid (or non-finite)
+    are passed to the real model, which stays available as `.model`.
+    """
+
+    def __init__(self, model, feature, grid, outputs, max_error):
+        self.model = model
+        self.feature = feature
+        self.grid = grid
+        self.outputs = outputs
+        self.max_error = max_error
+        self._step = np.log1p(grid[1]) - np.log1p(grid[0])
+        self._slopes = np.diff(outputs)
+
+    def _interpolate(self, values):
+        position = (np.log1p(values) - np.log1p(self.grid[0])) / self._step
+        cell = np.minimum(position.astype(np.intp), len(self._slopes) - 1)
+        return self.outputs[cell] + (position - cell) * self._slopes[cell]
+
+    def predict(self, X):
+        values = np.asarray(X[self.feature] if isinstance(X, pd.DataFrame) else np.asarray(X)[:, 0], dtype="float64")
+        in_range = np.isfinite(values) & (values >= self.grid[0]) & (values <= self.grid[-1])
+        if in_range.all():
+            return self._interpolate(values)
+        predictions = np.empty(len(values), dtype="float64")
+        predictions[in_range] = self._interpolate(values[in_range])
+        predictions[~in_range] = self.model.predict(pd.DataFrame({self.feature: values[~in_range]}))
+        return predictions
+
+
+class StepModel:
+    """
+    Exact drop-in replacement for a single-feature tree model (or tree ensemble).
+
+    A tree ensemble is constant between consecutive split thresholds, so its
+    output is tabulated once per interval and looked up with np.searchsorted.
+    Inputs are rounded to float32 first, as sklearn trees do. Non-finite
+    inputs are passed to the real model, which stays available as `.model`.
+    """
+
+    def __init__(self, model, feature, thresholds, outputs):
+        self.model = model
+        self.feature = feature
+        self.thresholds = thresholds
+        self.outputs = outputs
+
+    def _lookup(self, values):
+        values = values.astype(np.float32).astype("float64")
+        # Trees send x <= threshold left, so interval j is (thresholds[j-1], thresholds[j]]
+        return self.outputs[np.searchsorted(self.thresholds, values, side="left")]
+
+    def predict(self, X):
+        values = np.asarray(X[self.feature] if isinstance(X, pd.DataFrame) else np.asarray(X)[:, 0], dtype="float64")
+        finite = np.isfinite(values)
+        if finite.all():
+            return self._lookup(values)
+        predictions = np.empty(len(values), dtype="float64")
+        predictions[finite] = self._lookup(values[finite])
+        predictions[~finite] = self.model.predict(pd.DataFrame({self.feature: values[~finite]}))
+        return predictions
+
+
+def _split_thresholds(model):
+    """Sorted distinct split thresholds of a tree model or ensemble, or None for other models"""
+    if hasattr(model, "steps"):
+        if len(model.steps) > 1:
+            return None  # Thresholds would be on the transformed feature
+        model = model.steps[-1][1]
+    if hasattr(model, "tree_"):
+        trees = [model]
+    elif hasattr(model, "estimators_"):
+        trees = list(np.ravel(np.asarray(model.estimators_, dtype=object)))
+    else:
+        return None
+    if not trees or not all(hasattr(tree, "tree_") for tree in trees):
+        return None
+    thresholds = [tree.tree_.threshold[tree.tree_.feature >= 0] for tree in trees]
+    return np.unique(np.concatenate(thresholds)).astype("float64")
+
+
+def _interval_points(thresholds):
+    """One float32 input inside each interval (thresholds[j-1], thresholds[j]], plus one above the last"""
+    if thresholds.size == 0:
+        return np.zeros(1, dtype=np.float32)
+    upper = thresholds.astype(np.float32)
+    upper = np.where(upper.astype("float64") > thresholds, np.nextafter(upper, np.float32(-np.inf)), upper)
+    last = np.float32(thresholds[-1])
+    if last <= thresholds[-1]:
+        last = np.nextafter(last, np.float32(np.inf))
+    return np.append(upper, last)
+
+
+def _as_served(outputs, log_scale):
+    # Mirrors predict_performance(): log-scale outputs are expm1'd, negatives clipped
+    return np.maximum(np.where(log_scale, np.expm1(np.minimum(outputs, 20)), outputs), 0)
+
+
+def _error_ratio(expected, actual, rtol, atol):
+    """
+    Largest lookup error relative to the tolerance, on the scale the API reports.
+
+    predict_performance() applies expm1 when all of a request's predictions are
+    below 20, so any output below 20 may be served as expm1(output) and is
+    compared on that scale; larger outputs are always served as they are.
+    """
+    log_scale = expected < 20
+    expected_counts = _as_served(expected, log_scale)
+    error = np.abs(_as_served(actual, log_scale) - expected_counts)
+    return float((error / (atol + rtol * np.abs(expected_counts))).max())
+
+
+def _validation_points(max_value, seed):
+    rng = np.random.default_rng(seed)
+    return np.expm1(rng.uniform(0, np.log1p(max_value), LOOKUP_VALIDATION_POINTS))
+
+
+def _build_step_table(model, feature, thresholds, max_value, rtol, atol, seed):
+    outputs = np.asarray(model.predict(pd.DataFrame({feature: _interval_points(thresholds)})), dtype="float64")
+    lookup = StepModel(model, feature, thresholds, outputs)
+
+    # Exact by construction; checked anyway, including right at the thresholds
+    check = np.concatenate([_validation_points(max_value, seed), thresholds[thresholds >= 0]])
+    expected = np.asarray(model.predict(pd.DataFrame({feature: check})), dtype="float64")
+    return lookup, outputs, _error_ratio(expected, lookup.predict(pd.DataFrame({feature: check})), rtol, atol)
+
+
+def _build_interpolation_table(model, feature, grid_size, max_value, rtol, atol, seed):
+    log_grid = np.linspace(0, np.log1p(max_value), grid_size)
+    grid = np.expm1(log_grid)
+    outputs = np.asarray(model.predict(pd.DataFrame({feature: grid})), dtype="float64")
+    lookup = InterpolatedModel(model, feature, grid, outputs, max_error=None)
+
+    # Every grid midpoint (where linear interpolation is worst) plus random points
+    check = np.concatenate([np.expm1((log_grid[:-1] + log_grid[1:]) / 2), _validation_points(max_value, seed)])
+    expected = np.asarray(model.predict(pd.DataFrame({feature: check})), dtype="float64")
+    max_error = _error_ratio(expected, lookup._interpolate(check), rtol, atol)
+    lookup.max_error = max_error
+    return lookup, outputs, max_error
+
+
+def build_lookup(model, grid_size=None, max_value=None, rtol=None, atol=None, seed=0):
+    """
+    Tabulate a single-feature model and check the table against the real model.
+
+    Tree models get an exact piecewise-constant table over their split
+    thresholds; other models are sampled on a dense grid and interpolated.
+
+    Returns:
+        (lookup, info): lookup is a StepModel or InterpolatedModel, or None when
+        no table is used; info is a dict describing the outcome
+    """
+    grid_size = grid_size or LOOKUP_GRID_SIZE
+    max_value = max_value or LOOKUP_MAX_VALUE
+    rtol = LOOKUP_RTOL if rtol is None else rtol
+    atol = LOOKUP_ATOL if atol is None else atol
+
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and len(names) != 1:
+        return None, {"enabled": False, "reason": f"model uses {len(names)} features"}
+    feature = str(names[0]) if names is not None else "interaction"
+
+    start = time.perf_counter()
+    thresholds = _split_thresholds(model)
+    if thresholds is not None and thresholds.size + 1 <= LOOKUP_MAX_STEPS:
+        kind = "step"
+        lookup, outputs, max_error = _build_step_table(model, feature, thresholds, max_value, rtol, atol, seed)
+    else:
+        kind = "interpolated"
+        lookup, outputs, max_error = _build_interpolation_table(model, feature, grid_size, max_value, rtol, atol, seed)
+    info = {
+        "kind": kind,
+        "table_size": len(outputs),
+        "max_error_ratio": round(max_error, 4),  # <= 1 means within tolerance everywhere
+        "build_seconds": round(time.perf_counter() - start, 3),
+    }
+
+    if not np.all(np.isfinite(outputs)) or max_error > 1:
+        return None, {"enabled": False, "reason": "lookup error above tolerance", **info}
+    return lookup, {"enabled": True, **info}
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+
+# Limits for the fetch + predict pipelines
+MAX_CONCURRENT_PIPELINES = int(os.getenv("MAX_CONCURRENT_PIPELINES", 4))  # Across all clients
+MAX_CONCURRENT_PER_CLIENT = int(os.getenv("MAX_CONCURRENT_PER_CLIENT", 2))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", 32))  # Waiting for a slot
+QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", 30))  # Seconds to wait for a slot
+# Comma-separated proxy addresses whose X-Forwarded-For is honoured ("*" for any); empty trusts none
+TRUSTED_PROXIES = {p.strip() for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()}
+
+
+class SingleFlight:
+    """Run at most one coroutine per key; concurrent callers share its result"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.coalesced = 0
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+            print(f"🔗 Joined in-flight request: {key}")
+        # Shielded so one caller disconnecting doesn't cancel the work for the others
+        return await asyncio.shield(task)
+
+    @property
+    def inflight(self):
+        return len(self._inflight)
+
+
+class ConcurrencyLimiter:
+    """Per-client and global concurrency caps with a bounded, time-limited queue"""
+
+    def __init__(self, max_concurrent, max_per_client, max_queued, queue_timeout):
+        self.max_per_client = max_per_client
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._clients = {}  # client -> [semaphore, pending + running requests]
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self, client):
+        if self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise HTTPException(status_code=429, detail="Too many queued requests, please retry later")
+
+        entry = self._clients.setdefault(client, [asyncio.Semaphore(self.max_per_client), 0])
+        entry[1] += 1
+        self.waiting += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        try:
+            try:
+                await asyncio.wait_for(entry[0].acquire(), self.queue_timeout)
+                try:
+                    await asyncio.wait_for(self._global.acquire(), max(deadline - loop.time(), 0))
+                except BaseException:
+                    entry[0].release()
+                    raise
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Server busy, please retry later")
+            finally:
+                self.waiting -= 1
+
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+                self._global.release()
+                entry[0].release()
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._clients.get(client) is entry:
+                del self._clients[client]
+
+
+single_flight = SingleFlight()
+limiter = ConcurrencyLimiter(MAX_CONCURRENT_PIPELINES, MAX_CONCURRENT_PER_CLIENT, MAX_QUEUED_REQUESTS, QUEUE_TIMEOUT)
+
+
+def client_id(http_request):
+    """
+    Identify the caller by its address.
+
+    X-Forwarded-For is only honoured when the direct peer is in TRUSTED_PROXIES,
+    and then only its last entry (the one the proxy appended) is used; earlier
+    entries come from the client and can be anything.
+    """
+    peer = http_request.client.host if http_request.client else "unknown"
+    if TRUSTED_PROXIES and ("*" in TRUSTED_PROXIES or peer in TRUSTED_PROXIES):
+        forwarded = [hop.strip() for hop in http_request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if forwarded:
+            return forwarded[-1]
+    return peer
+
+
+async def run_coalesced(http_request, key, compute):
+    """
+    Run compute() once per key across identical in-flight requests, inside a concurrency slot.
+
+    Args:
+        http_request: Incoming request, used to identify the client
+        key: Hashable identity of the work, e.g. ("top5_posts", collection_id)
+        compute: Zero-argument coroutine function producing the response
+
+    Returns:
+        Whatever compute() returns; callers that joined an in-flight request
+        get the same object
+    """
+    client = client_id(http_request)
+
+    async def guarded():
+        async with limiter.slot(client):
+            return await compute()
+
+    return await single_flight.do(key, guarded)
+
+
+def stats():
+    """Current load, for the health endpoint"""
+    return {
+        "inflight": single_flight.inflight,
+        "coalesced": single_flight.coalesced,
+        "running": limiter.running,
+        "queued": limiter.waiting,
+        "rejected": limiter.rejected,
+    }
@@ -0,0 +1,112 @@
+import json
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+from memory_profile import memory_stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    print("⚠️ orjson not installed, falling back to the standard json encoder")
+
+# orjson handles NumPy arrays/scalars natively; NaN and inf become null
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+# Columns that are never rounded, even if they happen to be numeric
+TEXT_COLUMNS = ["_id", "caption", "timestamp", "type", "media_url"]
+
+
+def _encode_fallback(obj):
+    """Convert objects orjson (or json) can't serialize on its own"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (pd.Timestamp, pd.Timedelta)):
+        return None if pd.isna(obj) else obj.isoformat()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def _nan_to_none(obj):
+    """Replace float NaN/inf with None for the stdlib json fallback"""
+    if isinstance(obj, float) and not np.isfinite(obj):
+        return None
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_nan_to_none(v) for v in obj]
+    return obj
+
+
+def dumps(content) -> bytes:
+    """Serialize content to JSON bytes"""
+    if orjson:
+        return orjson.dumps(content, default=_encode_fallback, option=ORJSON_OPTIONS)
+    content = _nan_to_none(json.loads(json.dumps(content, default=_encode_fallback)))
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by orjson with native NumPy/pandas support.
+
+    Returning an instance of this class from a handler bypasses FastAPI's
+    jsonable_encoder, so DataFrame payloads from frame_to_payload() are
+    written without any per-cell Python conversion.
+    """
+
+    def render(self, content) -> bytes:
+        with memory_stage("serialize"):
+            return dumps(content)
+
+
+def _column_values(series: pd.Series, decimals: int):
+    """Return a JSON-ready list/array for a single column"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.tz_convert("UTC").dt.tz_localize(None) if series.dt.tz is not None else series
+        values = values.to_numpy(dtype="datetime64[s]")
+        iso = np.datetime_as_string(values, unit="s", timezone="UTC").astype(object)
+        iso[np.isnat(values)] = None
+        return iso.tolist()
+    if pd.api.types.is_bool_dtype(series):
+        return series.tolist()
+    if pd.api.types.is_numeric_dtype(series) and series.name not in TEXT_COLUMNS:
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+        values = np.nan_to_num(np.round(values, decimals), nan=0.0, posinf=0.0, neginf=0.0)
+        if pd.api.types.is_integer_dtype(series):
+            return values.astype(np.int64)
+        return values
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def frame_to_payload(df: pd.DataFrame, orient: str = "records", decimals: int = 2):
+    """
+    Convert a DataFrame into a JSON-ready payload.
+
+    Numeric columns are rounded and NaN-filled with 0 in one vectorized pass,
+    and timestamps are rendered as ISO-8601 strings.
+
+    Args:
+        df: DataFrame to convert
+        orient: "records" for a list of row dicts, "columns" for a dict of
+            column name -> list of values
+        decimals: Number of decimals to round numeric columns to
+
+    Returns:
+        list of dicts (records) or dict of column arrays (columns)
+    """
+    if orient not in ("records", "columns"):
+        raise ValueError(f"Unsupported orient: {orient}")
+
+    columns = {str(col): _column_values(df[col], decimals) for col in df.columns}
+
+    if orient == "columns":
+        return columns
+
+    names = list(columns)
+    rows = zip(*(col.tolist() if isinstance(col, np.ndarray) else col for col in columns.values()))
+    return [dict(zip(names, row)) for row in rows]
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# Same weighting as get_top_5_posts()
+SCORE_WEIGHTS = {"likesCount": 0.5, "commentsCount": 0.3, "reach": 0.2}
+
+
+class QuantileSketch:
+    """
+    Streaming quantile sketch with bounded relative error.
+
+    Values are counted in logarithmically sized bins (as in DDSketch), so any
+    quantile is within `relative_accuracy` of the true value and memory only
+    grows with the log of the value range, not with the number of values.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, values):
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def update(self, values):
+        """Add a batch of non-negative values to the sketch"""
+        values = np.asarray(values, dtype="float64")
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        positive = values[values > 0]
+        self.zero_count += int(values.size - positive.size)
+        self.count += int(values.size)
+        if positive.size:
+            keys, counts = np.unique(self._index(positive), return_counts=True)
+            for key, cnt in zip(keys.tolist(), counts.tolist()):
+                self.bins[key] = self.bins.get(key, 0) + cnt
+
+    def _cumulative(self):
+        keys = np.array(sorted(self.bins), dtype=np.int64)
+        counts = np.array([self.bins[k] for k in keys.tolist()], dtype=np.int64)
+        return keys, self.zero_count + np.cumsum(counts)
+
+    def quantile(self, q):
+        """Approximate value at quantile q (0-1)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        keys, cumulative = self._cumulative()
+        key = keys[min(np.searchsorted(cumulative, rank, side="right"), len(keys) - 1)]
+        return float(2 * self.gamma ** key / (self.gamma + 1))
+
+    def cdf(self, values):
+        """Approximate fraction of sketched values <= each of values"""
+        values = np.asarray(values, dtype="float64")
+        if self.count == 0:
+            return np.zeros(values.shape)
+        result = np.full(values.shape, self.zero_count / self.count)
+        positive = values > 0
+        if self.bins and positive.any():
+            keys, cumulative = self._cumulative()
+            pos = np.searchsorted(keys, self._index(values[positive]), side="right")
+            below = np.where(pos > 0, cumulative[np.maximum(pos - 1, 0)], self.zero_count)
+            result[positive] = below / self.count
+        return result
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """Count and selected quantiles, for reporting"""
+        return {"count": self.count, **{f"p{int(q * 100)}": self.quantile(q) for q in quantiles}}
+
+
+class StreamingTopK:
+    """
+    Single-pass approximate top-K over pages of predicted posts.
+
+    Each page updates one QuantileSketch per predicted metric. The best
+    `k * oversample` rows seen so far are kept as candidates; on every page
+    they are rescored together with the new rows against the current
+    sketches, so scores given by early, partial sketches never decide which
+    rows survive and the result does not depend on the order rows arrive in.
+    """
+
+    def __init__(self, k=5, oversample=20, keep_columns=None, relative_accuracy=0.01):
+        self.k = k
+        self.capacity = max(k * oversample, k)
+        self.keep_columns = keep_columns
+        self.sketches = {target: QuantileSketch(relative_accuracy) for target in SCORE_WEIGHTS}
+        self.rows_seen = 0
+        self._records = []
+        self._predictions = {target: np.empty(0) for target in SCORE_WEIGHTS}
+
+    def _score(self, predictions):
+        score = np.zeros(len(next(iter(predictions.values()))))
+        for target, weight in SCORE_WEIGHTS.items():
+            score += weight * self.sketches[target].cdf(predictions[target])
+        return score
+
+    def push(self, page):
+        """Add a page of posts that already has predicted_<target> columns"""
+        if page.empty:
+            return
+        self.rows_seen += len(page)
+        predictions = {}
+        for target in SCORE_WEIGHTS:
+            col = f"predicted_{target}"
+            values = page[col].to_numpy(dtype="float64") if col in page else np.ones(len(page))
+            predictions[target] = values
+            self.sketches[target].update(values)
+
+        scores = self._score(predictions)
+
+        # Only rows that could displace a kept candidate are converted to Python objects
+        take = min(self.capacity, len(page))
+        candidates = np.argpartition(-scores, take - 1)[:take] if take < len(page) else np.arange(len(page))
+        if len(self._records) >= self.capacity:
+            cutoff = self._score(self._predictions).min()
+            candidates = candidates[scores[candidates] > cutoff]
+        if candidates.size == 0:
+            return
+
+        columns = [c for c in (self.keep_columns or page.columns) if c in page.columns]
+        records = self._records + page.iloc[candidates][columns].to_dict(orient="records")
+        merged = {target: np.concatenate([self._predictions[target], predictions[target][candidates]])
+                  for target in SCORE_WEIGHTS}
+        if len(records) > self.capacity:
+            keep = np.argpartition(-self._score(merged), self.capacity - 1)[:self.capacity]
+            records = [records[i] for i in keep.tolist()]
+            merged = {target: values[keep] for target, values in merged.items()}
+        self._records = records
+        self._predictions = merged
+
+    def result(self):
+        """Top-K rows scored against the final sketches"""
+        if not self._records:
+            return pd.DataFrame()
+        candidates = pd.DataFrame(self._records)
+        for target in SCORE_WEIGHTS:
+            candidates[f"{target}_percentile"] = self.sketches[target].cdf(self._predictions[target])
+        candidates["performance_score"] = self._score(self._predictions)
+        return candidates.nlargest(self.k, "performance_score")
+
+    def summary(self):
+        """Rows processed and quantile summaries of each predicted metric"""
+        return {
+            "rows_seen": self.rows_seen,
+            "candidates_kept": len(self._records),
+            **{f"predicted_{target}": sketch.summary() for target, sketch in self.sketches.items()},
+        }
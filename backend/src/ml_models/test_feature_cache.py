@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+import feature_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_cache, "FEATURE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(feature_cache, "FEATURE_CACHE_ENABLED", True)
+    return tmp_path
+
+
+def _columns():
+    return {
+        "_id": np.array(["a", "b", "c", "d"], dtype=object),
+        "caption": np.array(["short", None, "", "long caption ✨ " * 200], dtype=object),
+        "type": np.array(["Image", np.nan, "Video", None], dtype=object),
+        "timestamp": pd.to_datetime(["2024-05-01", None, "2024-05-03", "2024-05-04"]).to_numpy(),
+        "likesCount": np.array([1.5, np.nan, 3.0, 4.0]),
+        "commentsCount": np.array([1, 2, 3, 4], dtype=np.int64),
+    }
+
+
+def test_round_trip_keeps_values_and_missing_text():
+    columns = _columns()
+    feature_cache.store("collection", "performance", "v1", columns)
+
+    loaded = feature_cache.load("collection", "performance", "v1")
+
+    assert list(loaded) == list(columns)
+    assert loaded["caption"].tolist() == ["short", None, "", "long caption ✨ " * 200]
+    assert loaded["type"].tolist() == ["Image", None, "Video", None]
+    np.testing.assert_array_equal(loaded["timestamp"], columns["timestamp"])
+    np.testing.assert_array_equal(loaded["likesCount"], columns["likesCount"])
+    assert loaded["commentsCount"].dtype == np.int64
+    assert isinstance(loaded["likesCount"], np.memmap)
+
+
+def test_missing_text_round_trips_as_null_in_frames():
+    feature_cache.store("collection", "performance", "v1", _columns())
+
+    frame = pd.DataFrame(feature_cache.load("collection", "performance", "v1"), copy=False)
+
+    assert frame["caption"].isna().tolist() == [False, True, False, False]
+
+
+def test_text_is_stored_compactly():
+    n = 10_000
+    captions = np.array([f"caption {i}" for i in range(n)], dtype=object)
+    captions[0] = "x" * 2200
+    feature_cache.store("collection", "performance", "v1", {"caption": captions})
+
+    assert feature_cache.stats()["bytes"] < 1_000_000
+
+
+def test_other_versions_and_kinds_miss():
+    feature_cache.store("collection", "performance", "v1", _columns())
+
+    assert feature_cache.load("collection", "performance", "v2") is None
+    assert feature_cache.load("collection", "engagement", "v1") is None
+    assert feature_cache.load("other", "performance", "v1") is None
+
+
+def test_eviction_keeps_cache_under_budget(monkeypatch):
+    monkeypatch.setattr(feature_cache, "FEATURE_CACHE_MAX_BYTES", 200_000)
+    for i in range(5):
+        feature_cache.store(f"collection_{i}", "performance", "v1", {"likesCount": np.zeros(10_000)})
+
+    stats = feature_cache.stats()
+    assert stats["bytes"] <= 200_000
+    assert feature_cache.load("collection_4", "performance", "v1") is not None
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer
+from model_lookup import InterpolatedModel, StepModel, build_lookup
+
+
+@pytest.fixture(scope="module")
+def training_data():
+    rng = np.random.default_rng(0)
+    interaction = np.round(np.expm1(rng.uniform(0, 12, 3000)))
+    target = np.log1p(3 * np.sqrt(interaction)) + rng.normal(0, 0.2, len(interaction))
+    return pd.DataFrame({"interaction": interaction}), target
+
+
+def _queries(model):
+    rng = np.random.default_rng(1)
+    thresholds = np.unique(np.concatenate([t.tree_.threshold[t.tree_.feature >= 0]
+                                           for t in np.ravel(np.asarray(model.estimators_, dtype=object))]))
+    values = np.concatenate([
+        np.expm1(rng.uniform(0, 14, 20_000)),
+        rng.integers(0, 1000, 5_000).astype("float64"),
+        thresholds,  # Exactly on the split points
+        np.nextafter(thresholds, np.inf),
+        np.nextafter(thresholds, -np.inf),
+        [0.0, -1.0, 1e12],
+    ])
+    return pd.DataFrame({"interaction": values})
+
+
+@pytest.mark.parametrize("make_model", [
+    lambda: RandomForestRegressor(n_estimators=30, random_state=0),
+    lambda: GradientBoostingRegressor(random_state=0),
+])
+def test_tree_step_table_matches_model_exactly(training_data, make_model):
+    X, y = training_data
+    model = make_model().fit(X, y)
+
+    lookup, info = build_lookup(model)
+
+    assert isinstance(lookup, StepModel)
+    assert info["enabled"] and info["kind"] == "step"
+    queries = _queries(model)
+    np.testing.assert_array_equal(lookup.predict(queries), model.predict(queries))
+
+
+def test_smooth_model_uses_interpolation_within_tolerance(training_data):
+    X, y = training_data
+    model = make_pipeline(FunctionTransformer(lambda a: np.log1p(np.asarray(a, dtype="float64"))),
+                          LinearRegression()).fit(X, y)
+
+    lookup, info = build_lookup(model)
+
+    assert isinstance(lookup, InterpolatedModel)
+    assert info["max_error_ratio"] <= 1
+    queries = pd.DataFrame({"interaction": np.expm1(np.linspace(0, 14, 1000))})
+    np.testing.assert_allclose(np.expm1(lookup.predict(queries)), np.expm1(model.predict(queries)), rtol=0.01, atol=0.5)
+
+
+def test_out_of_grid_inputs_use_the_model(training_data):
+    X, y = training_data
+    model = LinearRegression().fit(X, y)
+    lookup, _ = build_lookup(model, max_value=1e6)
+
+    queries = pd.DataFrame({"interaction": [-5.0, 2e6, 1e9]})
+    np.testing.assert_allclose(lookup.predict(queries), model.predict(queries))
+
+
+def test_coarse_grid_is_rejected_on_the_served_scale(training_data):
+    X, _ = training_data
+    # Log-scale model whose outputs pass 20 only at the top of the grid
+    def features(a):
+        log_a = np.log1p(np.asarray(a, dtype="float64"))
+        return np.c_[log_a, np.sin(3 * log_a)]
+
+    grid = np.expm1(np.linspace(0, 20, 500))
+    model = make_pipeline(FunctionTransformer(features), LinearRegression())
+    model.fit(pd.DataFrame({"interaction": grid}), 1.2 * np.log1p(grid) + 0.3 * np.sin(3 * np.log1p(grid)))
+
+    lookup, info = build_lookup(model, grid_size=64)
+
+    assert lookup is None
+    assert not info["enabled"]
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+from streaming_rank import QuantileSketch, StreamingTopK, SCORE_WEIGHTS
+
+
+def _posts(n, seed=0):
+    rng = np.random.default_rng(seed)
+    likes = rng.lognormal(5, 1.5, n)
+    return pd.DataFrame({
+        "_id": np.arange(n).astype(str),
+        "predicted_likesCount": likes,
+        "predicted_commentsCount": likes * rng.uniform(0.01, 0.1, n),
+        "predicted_reach": likes * rng.uniform(2, 5, n),
+    })
+
+
+def _exact_top(posts, k):
+    """Top-k by weighted percentile rank over the full frame"""
+    score = sum(weight * posts[f"predicted_{target}"].rank(pct=True) for target, weight in SCORE_WEIGHTS.items())
+    return set(posts.loc[score.nlargest(k).index, "_id"])
+
+
+def _stream(posts, k, page_size=1000):
+    ranker = StreamingTopK(k=k)
+    for start in range(0, len(posts), page_size):
+        ranker.push(posts.iloc[start:start + page_size])
+    return ranker
+
+
+@pytest.mark.parametrize("order", ["random", "ascending", "descending"])
+def test_top_k_does_not_depend_on_arrival_order(order):
+    posts = _posts(50_000)
+    if order != "random":
+        # Every metric sorted, like an account whose engagement keeps growing (or shrinking)
+        for col in posts.columns[1:]:
+            values = np.sort(posts[col].to_numpy())
+            posts[col] = values if order == "ascending" else values[::-1]
+
+    result = _stream(posts, k=5).result()
+
+    assert len(result) == 5
+    assert len(set(result["_id"]) & _exact_top(posts, 5)) >= 4
+    assert result["performance_score"].min() > 0.9
+
+
+def test_summary_counts_rows_and_bounds_candidates():
+    ranker = _stream(_posts(10_000), k=3, page_size=500)
+    summary = ranker.summary()
+
+    assert summary["rows_seen"] == 10_000
+    assert summary["candidates_kept"] == ranker.capacity
+
+
+def test_empty_stream_has_no_result():
+    ranker = StreamingTopK(k=5)
+    ranker.push(pd.DataFrame())
+
+    assert ranker.result().empty
+    assert ranker.summary()["rows_seen"] == 0
+
+
+def test_quantile_sketch_relative_error():
+    values = np.random.default_rng(1).lognormal(3, 2, 100_000)
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    sketch.update(values)
+
+    for q in (0.1, 0.5, 0.9, 0.99):
+        assert sketch.quantile(q) == pytest.approx(np.quantile(values, q), rel=0.02)
@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Engagement model inputs, in the order the scaler was fitted with
+FEATURE_COLUMNS = ['caption_length', 'hour', 'hashtag_count', 'mentions_count',
+                   'day_of_week_encoded', 'caption_sentiment']
+
+# Candidate values used for any feature the caller doesn't specify
+DEFAULT_GRID = {
+    "caption_length": [50, 150, 300, 600, 1200],
+    "hour": list(range(24)),
+    "hashtag_count": [0, 5, 10, 15, 20, 30],
+    "mentions_count": [0, 1, 3],
+    "day_of_week_encoded": list(range(7)),
+    "caption_sentiment": [0.0, 0.3, 0.6],
+}
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thur", "Fri", "Sat", "Sun"]
+
+MAX_GRID_SIZE = int(os.getenv("WHAT_IF_MAX_GRID_SIZE", 500000))
+WHAT_IF_CACHE_SIZE = int(os.getenv("WHAT_IF_CACHE_SIZE", 16))
+# Best rows kept per memoized grid, which also caps top_n
+MAX_TOP_N = int(os.getenv("WHAT_IF_MAX_TOP_N", 100))
+
+# Grid results only depend on the models, so they are memoized per model version.
+# Only what responses use is kept (best rows and feature effects), never the full scored grid.
+_grid_cache = OrderedDict()
+_grid_cache_lock = threading.Lock()
+
+
+def grid_key(settings):
+    """Canonical, hashable form of the candidate settings (defaults filled in)"""
+    return tuple(
+        (col, tuple(sorted(set(float(v) for v in (settings.get(col) or DEFAULT_GRID[col])))))
+        for col in FEATURE_COLUMNS
+    )
+
+
+def build_grid(key):
+    """Cartesian product of the candidate values as a DataFrame, one row per combination"""
+    values = [np.asarray(vals, dtype="float64") for _, vals in key]
+    size = int(np.prod([len(v) for v in values]))
+    if size > MAX_GRID_SIZE:
+        raise ValueError(f"Grid has {size} combinations, the maximum is {MAX_GRID_SIZE}")
+    mesh = np.meshgrid(*values, indexing="ij")
+    return pd.DataFrame({col: m.ravel() for col, m in zip(FEATURE_COLUMNS, mesh)})
+
+
+def score_grid(grid, scaler, models):
+    """Predict engagement for every row of the grid with one transform + predict per model"""
+    X_scaled = scaler.transform(grid[FEATURE_COLUMNS])
+    scored = grid.copy()
+    scored["expected_likes"] = np.maximum(np.expm1(models["likesCount"].predict(X_scaled)), 0)
+    scored["expected_comments"] = np.maximum(np.expm1(models["commentsCount"].predict(X_scaled)), 0)
+    # Same weighting as recommend_next_post()
+    scored["engagement_score"] = scored["expected_likes"] + scored["expected_comments"] * 2
+    return scored
+
+
+def summarize_grid(scored):
+    """The parts of a scored grid that responses use: its size, best rows and feature effects"""
+    return {
+        "grid_size": len(scored),
+        "best": scored.nlargest(MAX_TOP_N, "engagement_score").reset_index(drop=True),
+        "feature_effects": feature_effects(scored),
+    }
+
+
+def get_grid_summary(settings, scaler, models, version):
+    """
+    Scored and summarized grid for the given settings, memoized per model version.
+
+    Returns:
+        (summary dict from summarize_grid(), whether it came from the memo)
+    """
+    key = (version, grid_key(settings))
+    with _grid_cache_lock:
+        if key in _grid_cache:
+            _grid_cache.move_to_end(key)
+            return _grid_cache[key], True
+
+    summary = summarize_grid(score_grid(build_grid(key[1]), scaler, models))
+    with _grid_cache_lock:
+        _grid_cache[key] = summary
+        while len(_grid_cache) > WHAT_IF_CACHE_SIZE:
+            _grid_cache.popitem(last=False)
+    return summary, False
+
+
+def best_combinations(scored, top_n=10):
+    """Highest scoring feature combinations (scored can be a summary's "best" rows)"""
+    best = scored.nlargest(top_n, "engagement_score").reset_index(drop=True)
+    best.insert(best.columns.get_loc("day_of_week_encoded") + 1, "day",
+                [DAY_NAMES[int(d)] for d in best["day_of_week_encoded"]])
+    return best
+
+
+def feature_effects(scored):
+    """
+    Marginal effect of each feature over the grid.
+
+    For every feature with more than one candidate value, the mean engagement
+    score per value (averaged over all other settings), the best value and the
+    spread between best and worst.
+    """
+    effects = {}
+    for col in FEATURE_COLUMNS:
+        means = scored.groupby(col, sort=True)["engagement_score"].mean()
+        if len(means) < 2:
+            continue
+        effects[col] = {
+            "best_value": float(means.idxmax()),
+            "spread": float(means.max() - means.min()),
+            "mean_score_by_value": {str(k): round(float(v), 2) for k, v in means.items()},
+        }
+    return dict(sorted(effects.items(), key=lambda x: x[1]["spread"], reverse=True))
+
+
+def model_importances(models):
+    """Importances reported by the models themselves, when they expose them"""
+    importances = {}
+    for target, model in models.items():
+        estimator = model.steps[-1][1] if hasattr(model, "steps") else model
+        if hasattr(estimator, "feature_importances_"):
+            values = np.asarray(estimator.feature_importances_, dtype="float64")
+        elif hasattr(estimator, "coef_"):
+            values = np.abs(np.ravel(estimator.coef_)).astype("float64")
+        else:
+            continue
+        if len(values) != len(FEATURE_COLUMNS):
+            continue
+        total = values.sum() or 1.0
+        importances[target] = {col: round(float(v / total), 4) for col, v in zip(FEATURE_COLUMNS, values)}
+    return importances